@@ -1,35 +1,46 @@
 from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin
+from django.contrib.admin.views.main import ChangeList, ORDER_VAR
 from django.utils.safestring import mark_safe
 from django.utils.translation import gettext_lazy as _, ngettext
 
 from social_django.models import UserSocialAuth, Nonce, Association
 from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
 
-from .models import Profile, User, SocialLink
-from .utils import create_profile_html, get_change_admin_url, send_activation_mail, send_confirmation_mail
+from .cache import get_user_id_field, invalidate_auth_users, invalidate_profile_qr_codes
+from .enums import BulkEmailChoice
+from .models import Profile, User, SocialLink, OutboxEmail, BulkEmailJob
+from .jobs import start_bulk_email_job
+from .search import search
+from .utils import create_profile_html, get_change_admin_url
 
 
 class AgeProfileListFilter(admin.SimpleListFilter):
     title = _('Age')
     parameter_name = 'age'
+    # Inclusive & non overlapping, so every profile is counted in a single bucket
+    age_ranges = (
+        ((0, 17), _('Under Aage')),
+        ((18, 29), _('In the twenties')),
+        ((30, 39), _('In the thirties')),
+        ((40, 49), _('In the forties')),
+        ((50, 59), _('In the fifties')),
+        ((60, 69), _('In the sixties')),
+        ((70, 79), _('In the seventies')),
+    )
 
     def lookups(self, request, model_admin):
-        return (
-            ('0, 18', _('Under Aage')),
-            ('18,30', _('In the twenties')),
-            ('30,40', _('In the thirties')),
-            ('40,50', _('In the forties')),
-            ('50,60', _('In the fifties')),
-            ('60,70', _('In the sixties')),
-            ('70,80', _('In the seventies')),
-        )
+        # Counted with a single grouped query, keyed like the values of the filter
+        counts = model_admin.get_queryset(request).age_buckets([ages for ages, label in self.age_ranges])
+        return [
+            (f'{start},{end}', f'{label} ({counts[f"{start},{end}"]})') for (start, end), label in self.age_ranges
+        ]
 
     def queryset(self, request, queryset):
         val = self.value()
         if val is None:
             return queryset
-        start_age, end_age = self.value().split(',')
+        start_age, end_age = map(int, val.split(','))
         return queryset.age_range(start_age, end_age)
 
 
@@ -43,7 +54,17 @@ class SocialLinkInlineAdmin(admin.TabularInline):
     model = SocialLink
     extra = 0
     can_delete = False
-    readonly_fields = ('domain', 'create_at', 'update_at')
+    readonly_fields = ('domain', 'icon', 'create_at', 'update_at')
+
+
+class SearchRankChangeList(ChangeList):
+    """Rank the searched objects by the number of matched words, unless the list is sorted by a column"""
+
+    def get_ordering(self, request, queryset):
+        ordering = super().get_ordering(request, queryset)
+        if ORDER_VAR not in self.params and 'search_rank' in queryset.query.annotations:
+            return ['-search_rank', 'pk']
+        return ordering
 
 
 class ProfileAdmin(admin.ModelAdmin):
@@ -75,6 +96,15 @@ class ProfileAdmin(admin.ModelAdmin):
     )
     inlines = [SocialLinkInlineAdmin]
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        fields = [field.split('__')[-1] for field in self.search_fields]
+        return search(queryset, search_term, fields, tokens_lookup='user__search_tokens'), False
+
+    def get_changelist(self, request, **kwargs):
+        return SearchRankChangeList
+
     def formfield_for_dbfield(self, db_field, request, **kwargs):
         """
         Show a link to the model with this field already exists.
@@ -96,14 +126,14 @@ class ProfileAdmin(admin.ModelAdmin):
 
     def show_image(self, obj):
         if obj.image:
-            return create_profile_html(obj.image)
+            return create_profile_html(obj.image, obj.image_variants)
         return ''
 
     show_image.short_description = ''
 
     def show_cover(self, obj):
         if obj.cover:
-            return create_profile_html(obj.cover)
+            return create_profile_html(obj.cover, obj.cover_variants)
         return ''
 
     show_cover.short_description = ''
@@ -119,10 +149,27 @@ class CustomUserAdmin(UserAdmin):
             return []
         return self.inlines
 
+    def start_email_job(self, request, queryset, email):
+        job = start_bulk_email_job(request, queryset, email)
+        self.message_user(
+            request,
+            mark_safe(
+                _("Sending %(email)s mail to %(count)d users, <a href='%(url)s'>follow the progress here</a>.") % {
+                    'email': job.get_email_display().lower(), 'count': job.total, 'url': get_change_admin_url(job)
+                }
+            ),
+            messages.INFO,
+        )
+
     def deactivate_users(self, request, queryset):
-        updated = queryset.filter(is_active=True).update(is_active=False)
-        for user in queryset:
-            send_activation_mail(request, user)
+        # The users are selected by their pks, the filter on the flag wouldn't match them anymore after the update
+        queryset = User.objects.filter(pk__in=list(queryset.filter(is_active=True).values_list('pk', flat=True)))
+        user_ids = list(queryset.values_list(get_user_id_field(), flat=True))
+        qr_codes = list(Profile.objects.filter(user__in=queryset).values_list('qr_code', flat=True))
+        updated = queryset.update(is_active=False)
+        # update() doesn't send post_save, drop the cached users & profiles here
+        invalidate_auth_users(user_ids)
+        invalidate_profile_qr_codes(qr_codes)
         self.message_user(
             request,
             _(
@@ -134,13 +181,19 @@ class CustomUserAdmin(UserAdmin):
             ),
             messages.SUCCESS,
         )
+        self.start_email_job(request, queryset, BulkEmailChoice.ACTIVATION)
 
     deactivate_users.short_description = _('Deactivate selected Users')
 
     def activate_users(self, request, queryset):
-        updated = queryset.filter(is_active=False).update(is_active=True)
-        for user in queryset:
-            send_confirmation_mail(request, user)
+        # The users are selected by their pks, the filter on the flag wouldn't match them anymore after the update
+        queryset = User.objects.filter(pk__in=list(queryset.filter(is_active=False).values_list('pk', flat=True)))
+        user_ids = list(queryset.values_list(get_user_id_field(), flat=True))
+        qr_codes = list(Profile.objects.filter(user__in=queryset).values_list('qr_code', flat=True))
+        updated = queryset.update(is_active=True)
+        # update() doesn't send post_save, drop the cached users & profiles here
+        invalidate_auth_users(user_ids)
+        invalidate_profile_qr_codes(qr_codes)
         self.message_user(
             request,
             _(
@@ -152,28 +205,46 @@ class CustomUserAdmin(UserAdmin):
             ),
             messages.SUCCESS,
         )
+        self.start_email_job(request, queryset, BulkEmailChoice.CONFIRMATION)
 
     activate_users.short_description = _('Activate selected Users')
 
     def send_users_activation_mail(self, request, queryset):
-        queryset = queryset.filter(is_active=False)
-        for user in queryset:
-            send_activation_mail(request, user)
-        self.message_user(
-            request,
-            _(
-                ngettext(
-                    "%d user has successfully received the email.",
-                    "%d users have successfully received the email.",
-                    queryset,
-                ) % queryset
-            ),
-            messages.SUCCESS,
-        )
+        self.start_email_job(request, queryset.filter(is_active=False), BulkEmailChoice.ACTIVATION)
 
     send_users_activation_mail.short_description = _('Send activation mail')
 
 
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'to', 'status', 'attempts', 'send_after', 'sent_at', 'create_at')
+    list_filter = ('status', )
+    search_fields = ('subject', )
+    date_hierarchy = 'create_at'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+class BulkEmailJobAdmin(admin.ModelAdmin):
+    list_display = ('email', 'status', 'show_progress', 'total', 'create_at', 'update_at')
+    list_filter = ('email', 'status')
+    readonly_fields = ('show_progress', )
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def show_progress(self, obj):
+        return f'{obj.processed}/{obj.total} ({obj.progress}%)'
+
+    show_progress.short_description = _('Progress')
+
+
 admin.site.unregister(Nonce)
 admin.site.unregister(Association)
 admin.site.unregister(UserSocialAuth)
@@ -181,3 +252,5 @@ admin.site.unregister(BlacklistedToken)
 admin.site.unregister(OutstandingToken)
 admin.site.register(User, CustomUserAdmin)
 admin.site.register(Profile, ProfileAdmin)
+admin.site.register(OutboxEmail, OutboxEmailAdmin)
+admin.site.register(BulkEmailJob, BulkEmailJobAdmin)
@@ -0,0 +1,70 @@
+from django.db import DEFAULT_DB_ALIAS
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.exceptions import InvalidToken, AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from accounts.cache import get_auth_user_cache_key, get_auth_user_cache_timeout
+from core.databases import set_routing_user, aset_routing_user
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that keeps the user of the token subject, with the profile joined, in the cache for
+    `AUTH_USER_CACHE_TIMEOUT` seconds, so authenticated requests don't query the database on a warm cache.
+    The entries are dropped when the user or the profile changes. Async views await `aauthenticate` instead.
+    """
+
+    def get_user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+    def get_user_queryset(self):
+        # A missing profile is cached by the join as well, so checking it later doesn't query again.
+        # Read from the primary, a replica may still have the user that a change has just dropped from the cache
+        return self.user_model.objects.using(DEFAULT_DB_ALIAS).select_related('profile')
+
+    def check_user(self, user):
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
+
+    def get_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        cache_key = get_auth_user_cache_key(user_id)
+        user = cache.get(cache_key)
+        if user is None:
+            try:
+                user = self.get_user_queryset().get(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            cache.set(cache_key, user, get_auth_user_cache_timeout())
+        set_routing_user(user.pk)
+        return self.check_user(user)
+
+    async def aget_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        cache_key = get_auth_user_cache_key(user_id)
+        user = await cache.aget(cache_key)
+        if user is None:
+            try:
+                user = await self.get_user_queryset().aget(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            await cache.aset(cache_key, user, get_auth_user_cache_timeout())
+        await aset_routing_user(user.pk)
+        return self.check_user(user)
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
@@ -1,8 +1,7 @@
-from django.db import models
-
 from django_filters import rest_framework as filters
 
-from accounts.models import User, Profile, VisitLog
+from accounts.search import search, USER_SEARCH_FIELDS
+from accounts.models import User, Profile, VisitLog, DailyVisitStat
 
 
 class UserFilter(filters.FilterSet):
@@ -10,10 +9,7 @@ class UserFilter(filters.FilterSet):
 
     def custom_search(self, queryset, name, value):
         """Search first & last & nick name, and email"""
-        return queryset.filter(
-            models.Q(first_name__icontains=value) | models.Q(last_name__icontains=value) |
-            models.Q(email__icontains=value) | models.Q(username__icontains=value)
-        )
+        return search(queryset, value, USER_SEARCH_FIELDS)
 
     class Meta:
         model = User
@@ -24,7 +20,7 @@ class ProfileFilter(filters.FilterSet):
 
     class Meta:
         model = Profile
-        exclude = ('user', 'image', 'cover', 'create_at', 'update_at')
+        exclude = ('user', 'image', 'cover', 'image_variants', 'cover_variants', 'create_at', 'update_at')
 
 
 class VisitLogFilter(filters.FilterSet):
@@ -34,3 +30,12 @@ class VisitLogFilter(filters.FilterSet):
     class Meta:
         model = VisitLog
         fields = ('visitor', 'profile', 'before', 'after')
+
+
+class DailyVisitStatFilter(filters.FilterSet):
+    start = filters.DateFilter(field_name='date', lookup_expr='gte')
+    end = filters.DateFilter(field_name='date', lookup_expr='lte')
+
+    class Meta:
+        model = DailyVisitStat
+        fields = ('start', 'end')
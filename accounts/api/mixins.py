@@ -3,6 +3,8 @@ from typing import List, Tuple
 from rest_framework.exceptions import MethodNotAllowed
 from rest_framework.permissions import AllowAny, SAFE_METHODS
 
+from .utils import get_serializer_relations
+
 
 class RetrieveMethodNotAllowedMixin:
 
@@ -81,3 +83,25 @@ class ThrottleActionsWithMethodsMixin:
         if not ((self.action, self.request.method) in self.throttle_actions):
             return []
         return super().get_throttles()
+
+
+class ExpandQuerysetOptimizerMixin:
+    """
+    Mixin to join & prefetch the relations that the serializer reads for the requested `expand` tree,
+    so the number of queries of a list response doesn't grow with the page size.
+    Override `get_prefetch` to replace a prefetch lookup, EG.: with a filtered `Prefetch` object.
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request is None or self.request.method not in SAFE_METHODS:
+            return queryset
+        select, prefetch = get_serializer_relations(self.get_serializer(), queryset.model)
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*(self.get_prefetch(lookup) for lookup in prefetch))
+        return queryset
+
+    def get_prefetch(self, lookup):
+        return lookup
@@ -0,0 +1,87 @@
+from base64 import b64decode, b64encode
+from binascii import Error as BinasciiError
+
+from django.db import models
+from django.utils.dateparse import parse_datetime
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetOrPageNumberPagination(PageNumberPagination):
+    """
+    Page number pagination, unless the client opts into keyset pagination by sending the `cursor` query parameter
+    (empty for the first page) on a model having `create_at`.
+    Keyset pages are ordered by (create_at, id) descending and start after the last row of the previous page,
+    so neither a COUNT nor an OFFSET is needed and every page costs the same as the first one.
+    """
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = _('Invalid cursor')
+    keyset = False
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param not in request.query_params or not self.has_keyset_fields(queryset.model):
+            return super().paginate_queryset(queryset, request, view)
+
+        self.keyset = True
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        queryset = queryset.order_by('-create_at', '-id')
+        cursor = self.decode_cursor(request)
+        if cursor is not None:
+            create_at, pk = cursor
+            queryset = queryset.filter(models.Q(create_at__lt=create_at) | models.Q(create_at=create_at, id__lt=pk))
+
+        results = list(queryset[:page_size + 1])
+        self.page = results[:page_size]
+        self.has_next = len(results) > page_size
+        return self.page
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        last = self.page[-1]
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(last.create_at, last.pk))
+
+    def get_previous_link(self):
+        if not self.keyset:
+            return super().get_previous_link()
+        return None
+
+    @staticmethod
+    def has_keyset_fields(model) -> bool:
+        return any(field.name == 'create_at' for field in model._meta.concrete_fields)
+
+    @staticmethod
+    def encode_cursor(create_at, pk) -> str:
+        return b64encode(f'{create_at.isoformat()}|{pk}'.encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params[self.cursor_query_param]
+        if not encoded:
+            return None
+        try:
+            create_at, pk = b64decode(encoded.encode(), validate=True).decode().split('|')
+            create_at, pk = parse_datetime(create_at), int(pk)
+        except (TypeError, ValueError, UnicodeDecodeError, BinasciiError):
+            raise NotFound(self.invalid_cursor_message)
+        if create_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return create_at, pk
@@ -27,6 +27,12 @@ class IsUserWithProfile(BasePermission):
         return False
 
 
+class IsAuthenticatedWithProfile(BasePermission):
+
+    def has_permission(self, request, view) -> bool:
+        return request.user.is_authenticated and user_has_profile(request.user)
+
+
 class DenyDelete(BasePermission):
 
     def has_permission(self, request, view):
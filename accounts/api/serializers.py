@@ -6,32 +6,30 @@ from rest_flex_fields import FlexFieldsModelSerializer
 from rest_flex_fields.serializers import FlexFieldsSerializerMixin
 from djoser.serializers import UserSerializer, UserCreateSerializer
 
-from accounts.utils import get_icon_from_hostname
-from accounts.models import Profile, VisitLog, SocialLink, GenderChoice
+from core.images import is_image_pending
+from core.serializers import ImageSrcsetField
+from accounts.models import Profile, VisitLog, SocialLink, DailyVisitStat, GenderChoice
 
 
 User = get_user_model()
 
 
 class SocialLinkSerializer(serializers.ModelSerializer):
-    domain = serializers.CharField(read_only=True)
-    icon = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         model = SocialLink
         fields = ('id', 'profile', 'url', 'is_active', 'domain', 'icon', 'create_at', 'update_at')
         read_only_fields = ('id', 'profile', 'domain', 'icon', 'create_at', 'update_at')
 
-    def get_icon(self, instance) -> str:
-        return get_icon_from_hostname(instance.domain)
-
 
 class ProfileSerializer(FlexFieldsModelSerializer):
     age = serializers.IntegerField(read_only=True)
+    image_srcset = ImageSrcsetField('image')
+    cover_srcset = ImageSrcsetField('cover')
 
     class Meta:
         model = Profile
-        exclude = ()
+        exclude = ('image_variants', 'cover_variants')
         read_only_fields = ('id', 'user', 'create_at', 'update_at', 'qr_code', 'age')
         expandable_fields = {
             'links': (SocialLinkSerializer, {'many': True, 'read_only': True}),
@@ -45,15 +43,15 @@ class ProfileSerializer(FlexFieldsModelSerializer):
 
         request = self.context['request']
 
-        # Set default image based on gender
-        if not instance.image:
+        # Set default image based on gender, until an image is uploaded and processed
+        if not instance.image or is_image_pending(instance.image, instance.image_variants):
             if instance.gender == GenderChoice.FEMALE:
                 data['image'] = request.build_absolute_uri('/static/images/profile_female.png')
             else:
                 data['image'] = request.build_absolute_uri('/static/images/profile_male.png')
 
-        # Set default cover in case of being empty
-        if not instance.cover:
+        # Set default cover in case of being empty or not processed yet
+        if not instance.cover or is_image_pending(instance.cover, instance.cover_variants):
             data['cover'] = request.build_absolute_uri('/static/images/profile_cover.png')
 
         return data
@@ -92,3 +90,17 @@ class VisitLogSerializer(FlexFieldsModelSerializer):
         if profile.user == user:
             raise serializers.ValidationError(_('Cant create visit for same profile'))
         return profile
+
+
+class DailyVisitStatSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = DailyVisitStat
+        fields = ('date', 'total', 'scanned', 'unique_visitors')
+        read_only_fields = fields
+
+
+class VisitStatSummarySerializer(serializers.Serializer):
+    total = serializers.IntegerField(read_only=True)
+    scanned = serializers.IntegerField(read_only=True)
+    unique_visitors = serializers.IntegerField(read_only=True)
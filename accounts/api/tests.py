@@ -0,0 +1,208 @@
+import re
+from base64 import b64encode
+from datetime import timedelta
+
+from django.db import connection
+from django.core.cache import cache
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import now
+
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.cache import get_auth_user_cache_key
+from accounts.models import User, Profile, VisitLog
+
+
+class VisitLogQueryPlanTests(TestCase):
+    """
+    Capture the query plans of the visit log actions, and fail when one of them reads the visit logs table with a
+    sequential scan or sorts them in a temporary structure instead of walking an index.
+    """
+    table = VisitLog._meta.db_table
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create_user(email=f'user{i}@finder.com', username=f'user{i}', password='password')
+            for i in range(5)
+        ]
+        VisitLog.objects.bulk_create([
+            VisitLog(visitor=visitor, profile=user.profile, hide_from_visitor=i % 3 == 0,
+                     hide_from_profile=i % 4 == 0, is_scanned=i % 2 == 0)
+            for i, (visitor, user) in enumerate((visitor, user) for visitor in cls.users for user in cls.users
+                                                if visitor != user)
+        ])
+
+    def setUp(self):
+        self.user = self.users[0]
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'JWT {AccessToken.for_user(self.user)}')
+        if connection.vendor == 'postgresql':
+            # Small tables are always scanned sequentially, make the planner prefer any usable index
+            with connection.cursor() as cursor:
+                cursor.execute('SET enable_seqscan = off')
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                return [row[-1] for row in cursor.fetchall()]
+            cursor.execute(f'EXPLAIN {sql}')
+            return [row[0] for row in cursor.fetchall()]
+
+    def get_plan_problems(self, plan):
+        problems = []
+        for line in plan:
+            if connection.vendor == 'sqlite':
+                if re.match(rf'SCAN {self.table}$', line.strip()) or 'TEMP B-TREE' in line:
+                    problems.append(line)
+            elif re.search(rf'Seq Scan on {self.table}\b', line) or re.search(r'^\W*Sort\b', line.strip()):
+                problems.append(line)
+        return problems
+
+    def assertIndexedPlans(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.data)
+
+        queries = [query['sql'] for query in context.captured_queries
+                   if query['sql'].startswith('SELECT') and f'FROM "{self.table}"' in query['sql']]
+        self.assertTrue(queries, f'No visit log query was captured for {url}')
+        for sql in queries:
+            plan = self.explain(sql)
+            self.assertFalse(self.get_plan_problems(plan), '\n'.join([url, sql, *plan]))
+
+    def test_list(self):
+        self.assertIndexedPlans('/api/visit/')
+
+    def test_list_created_range(self):
+        self.assertIndexedPlans('/api/visit/?before=2020-01-01 00:00:00&after=2100-01-01 00:00:00')
+
+    def test_list_keyset(self):
+        self.assertIndexedPlans('/api/visit/?cursor=')
+
+    def test_retrieve(self):
+        visit = VisitLog.objects.filter(visitor=self.user).first()
+        self.assertIndexedPlans(f'/api/visit/{visit.pk}/')
+
+    def test_my_visits(self):
+        self.assertIndexedPlans('/api/visit/my-visits/')
+
+    def test_my_visits_keyset(self):
+        self.assertIndexedPlans('/api/visit/my-visits/?cursor=')
+
+    def test_my_views(self):
+        self.assertIndexedPlans('/api/visit/my-views/')
+
+    def test_my_views_keyset(self):
+        self.assertIndexedPlans('/api/visit/my-views/?cursor=')
+
+
+class KeysetPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, *cls.others = [
+            User.objects.create_user(email=f'user{i}@finder.com', username=f'user{i}', password='password')
+            for i in range(4)
+        ]
+        cls.start = now()
+        VisitLog.objects.bulk_create([
+            VisitLog(visitor=cls.user, profile=cls.others[i % 3].profile) for i in range(45)
+        ])
+        # Several visits share the same time, the pages are only split right when the id breaks the ties
+        for i, visit in enumerate(VisitLog.objects.order_by('id')):
+            VisitLog.objects.filter(pk=visit.pk).update(create_at=cls.start - timedelta(minutes=i // 4))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'JWT {AccessToken.for_user(self.user)}')
+
+    def get_pages(self, url):
+        pages = []
+        while url is not None:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, response.data)
+            self.assertNotIn('count', response.data)
+            pages.append([visit['id'] for visit in response.data['results']])
+            url = response.data['next']
+        return pages
+
+    def test_pages_walk_every_visit_once(self):
+        expected = list(VisitLog.objects.order_by('-create_at', '-id').values_list('id', flat=True))
+        for url in ('/api/visit/?cursor=', '/api/visit/my-visits/?cursor='):
+            pages = self.get_pages(url)
+            self.assertEqual([len(page) for page in pages], [20, 20, 5])
+            self.assertEqual([visit_id for page in pages for visit_id in page], expected)
+
+    def test_new_visits_dont_shift_the_next_pages(self):
+        response = self.client.get('/api/visit/my-visits/?cursor=')
+        first_page = [visit['id'] for visit in response.data['results']]
+        VisitLog.objects.create(visitor=self.user, profile=self.others[0].profile)
+
+        next_pages = self.get_pages(response.data['next'])
+        seen = first_page + [visit_id for page in next_pages for visit_id in page]
+        self.assertEqual(len(seen), 45)
+        self.assertEqual(len(set(seen)), 45)
+
+    def test_page_number_pagination_without_cursor(self):
+        response = self.client.get('/api/visit/my-visits/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 45)
+
+    def test_invalid_cursor(self):
+        for cursor in ('not base64', b64encode(b'garbage').decode(), b64encode(b'yesterday|1').decode(),
+                       b64encode(f'{self.start.isoformat()}|one'.encode()).decode(), b64encode(b'\xff|1').decode()):
+            with self.subTest(cursor=cursor):
+                response = self.client.get('/api/visit/my-visits/', {'cursor': cursor})
+                self.assertEqual(response.status_code, 404)
+
+
+class CachedJWTAuthenticationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='user@finder.com', username='user', password='password')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'JWT {AccessToken.for_user(self.user)}')
+        self.cache_key = get_auth_user_cache_key(self.user.email)
+
+    def get_profile(self):
+        response = self.client.get('/api/profile/me/')
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def test_user_is_cached(self):
+        self.get_profile()
+        self.assertEqual(cache.get(self.cache_key), self.user)
+        with self.assertNumQueries(0):
+            self.get_profile()
+
+    def test_profile_change_invalidates_the_cached_user(self):
+        self.get_profile()
+        profile = Profile.objects.get(user=self.user)
+        profile.address = 'Cairo'
+        profile.save()
+        self.assertIsNone(cache.get(self.cache_key))
+        self.assertEqual(self.get_profile()['address'], 'Cairo')
+
+    def test_user_change_invalidates_the_cached_user(self):
+        self.get_profile()
+        User.objects.get(pk=self.user.pk).save()
+        self.assertIsNone(cache.get(self.cache_key))
+
+    def test_deactivated_user_is_rejected(self):
+        self.get_profile()
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/profile/me/').status_code, 401)
+
+    def test_username_change_rejects_the_old_tokens(self):
+        self.get_profile()
+        response = self.client.post('/api/auth/users/set_email/',
+                                    {'current_password': 'password', 'new_email': 'new@finder.com'})
+        self.assertEqual(response.status_code, 204, response.data)
+        self.assertIsNone(cache.get(self.cache_key))
+        self.assertEqual(self.client.get('/api/profile/me/').status_code, 401)
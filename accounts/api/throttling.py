@@ -1,13 +1,20 @@
-from rest_framework.throttling import UserRateThrottle
+from rest_framework.throttling import UserRateThrottle, AnonRateThrottle
+
+from core.throttling import FixedWindowRateThrottle
 
 
 UPDATE_METHODS = ('PUT', 'PATCH')
 
 
-class UpdateRateThrottle(UserRateThrottle):
+class UpdateRateThrottle(FixedWindowRateThrottle, UserRateThrottle):
     scope = 'update'
 
     def allow_request(self, request, view):
         if request.method not in UPDATE_METHODS:
             return True
         return super().allow_request(request, view)
+
+
+class ScanRateThrottle(FixedWindowRateThrottle, AnonRateThrottle):
+    """Anonymous QR code scans record visits, limit them per IP address"""
+    scope = 'scan'
@@ -1,21 +1,45 @@
+from django.conf import settings
 from django.urls import path, re_path, include
 
 from rest_framework import routers
 from djoser.social.views import ProviderAuthView
 
-from .views import ProfileViewSet, VisitLogViewSet, UserViewSet, SocialLinkViewSet
+from core.async_views import method_dispatch
+from .views import (ProfileViewSet, ProfileAPIView, ProfileByQRCodeAPIView, AsyncProfileByQRCodeAPIView,
+                    ProfileQRCodeAPIView, VisitLogViewSet, VisitStatViewSet, UserViewSet, SocialLinkViewSet)
 
 
 app_name = 'accounts'
 
 router = routers.DefaultRouter()
 router.register(r'profile', ProfileViewSet, basename='profile')
+# Registered before visit, otherwise `stats` is matched as a visit id
+router.register(r'visit/stats', VisitStatViewSet, basename='visit_stats')
 router.register(r'visit', VisitLogViewSet, basename='visit')
 router.register(r'auth/users', UserViewSet, basename='user')
 router.register(r'social-link', SocialLinkViewSet, basename='social_link')
 
+if settings.ASYNC_VIEWS:
+    # Async views of the busiest profile routes, matched before the routes of the viewset
+    profile_urlpatterns = [
+        path('profile/by-qr/<int:qr_code>/', AsyncProfileByQRCodeAPIView.as_view(), name='profile-by-qr'),
+        path('profile/<int:pk>/', method_dispatch(
+            ProfileAPIView.as_view(),
+            ProfileViewSet.as_view({'get': 'retrieve', 'put': 'update', 'patch': 'partial_update'},
+                                   basename='profile', detail=True, suffix='Instance')
+        ), name='profile-detail'),
+    ]
+else:
+    profile_urlpatterns = [
+        path('profile/by-qr/<int:qr_code>/', ProfileByQRCodeAPIView.as_view(), name='profile-by-qr'),
+    ]
+
 urlpatterns = [
     path('auth/', include('djoser.urls.jwt'), name='jwt'),
     re_path(r"^auth/social/(?P<provider>\S+)/$", ProviderAuthView.as_view(), name="social-auth-provider"),
+    *profile_urlpatterns,
+    # A file url, without the trailing slash of the router
+    re_path(r'^profile/qr-code/(?P<qr_code>\d+)\.(?P<image_format>png|svg)$', ProfileQRCodeAPIView.as_view(),
+            name='profile-qr-code'),
     path('', include(router.urls), name='routes'),
 ]
@@ -1,5 +1,61 @@
+from django.core.exceptions import FieldDoesNotExist
+
+from rest_framework.relations import ManyRelatedField
+from rest_framework.serializers import BaseSerializer, ListSerializer
+from rest_flex_fields.serializers import FlexFieldsSerializerMixin
+
 from accounts.models import Profile
 
 
 def user_has_profile(user):
     return isinstance(getattr(user, 'profile', None), Profile)
+
+
+def get_representation_fields(serializer):
+    """Get the serializer fields used for representation, including the ones expanded by the request query params"""
+    if isinstance(serializer, FlexFieldsSerializerMixin) and not serializer._flex_fields_rep_applied:
+        # Same as FlexFieldsSerializerMixin.to_representation does before serializing the first instance
+        serializer.apply_flex_fields(serializer.fields, serializer._flex_options_rep_only)
+        serializer._flex_fields_rep_applied = True
+    return serializer.fields
+
+
+def get_serializer_relations(serializer, model, prefix='', selectable=True, select=None, prefetch=None):
+    """
+    Collect the `select_related` & `prefetch_related` lookups of the relations read by the serializer fields,
+    nested and expanded serializers included.
+    Single valued relations are joined as long as all of their parents are joined, others are prefetched.
+    """
+    select = [] if select is None else select
+    prefetch = [] if prefetch is None else prefetch
+
+    for field in get_representation_fields(serializer).values():
+        nested = field.child if isinstance(field, ListSerializer) else field
+        if field.source == '*' or '.' in field.source:
+            continue
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            continue
+        if not model_field.is_relation:
+            continue
+
+        is_serializer = isinstance(nested, BaseSerializer)
+        is_single = not isinstance(field, (ListSerializer, ManyRelatedField)) and (
+            model_field.many_to_one or model_field.one_to_one
+        )
+        # Primary keys of forward relations are read from the model's own column
+        if not is_serializer and is_single and model_field.concrete:
+            continue
+
+        lookup = f'{prefix}{field.source}'
+        if selectable and is_single:
+            select.append(lookup)
+        else:
+            prefetch.append(lookup)
+
+        if is_serializer and hasattr(getattr(nested, 'Meta', None), 'model'):
+            get_serializer_relations(nested, model_field.related_model, f'{lookup}__', selectable and is_single,
+                                     select, prefetch)
+
+    return select, prefetch
@@ -1,33 +1,46 @@
-from django.db import models
+from asgiref.sync import sync_to_async
+
+from django.db import models, transaction, IntegrityError
+from django.http import FileResponse
+from django.utils.cache import patch_cache_control
 from django.utils.timezone import now
 from django.utils.translation import gettext_lazy as _
 
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.generics import GenericAPIView
 from rest_framework.viewsets import GenericViewSet
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import PermissionDenied, NotFound
+from rest_framework.permissions import SAFE_METHODS, AllowAny
 from rest_framework.mixins import (CreateModelMixin, RetrieveModelMixin, UpdateModelMixin, ListModelMixin,
                                    DestroyModelMixin)
 
-from rest_flex_fields import is_expanded
+from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema
 from djoser.conf import settings
 from djoser.views import UserViewSet as DjoserUserViewSet
 from djoser.compat import get_user_email, get_user_email_field_name
 
 from accounts import signals
-from accounts.models import User, Profile, VisitLog, SocialLink
-from .utils import user_has_profile
-from .throttling import UpdateRateThrottle
-from .permissions import IsUserWithProfile
-from .filters import ProfileFilter, VisitLogFilter, UserFilter
-from .serializers import ProfileSerializer, VisitLogSerializer, SocialLinkSerializer
-from .mixins import AllowAnyInSafeMethodOrCustomPermissionMixin, ThrottleActionsWithMethodsMixin
-
-
-class ProfileViewSet(AllowAnyInSafeMethodOrCustomPermissionMixin, RetrieveModelMixin, UpdateModelMixin, ListModelMixin,
-                     GenericViewSet):
+from accounts.buffers import visit_log_buffer
+from accounts.cache import get_user_id_field, invalidate_auth_users, invalidate_profile_qr_codes
+from core.metrics import SerializerMetricsMixin
+from core.async_views import AsyncAPIViewMixin
+from core.qr_codes import QR_CODE_CONTENT_TYPES, get_qr_code_file
+from accounts.models import User, Profile, VisitLog, SocialLink, DailyVisitStat, DailyVisitor
+from .utils import user_has_profile, get_serializer_relations
+from .throttling import UpdateRateThrottle, ScanRateThrottle
+from .permissions import IsUserWithProfile, IsAuthenticatedWithProfile
+from .filters import ProfileFilter, VisitLogFilter, UserFilter, DailyVisitStatFilter
+from .serializers import (ProfileSerializer, VisitLogSerializer, SocialLinkSerializer, DailyVisitStatSerializer,
+                          VisitStatSummarySerializer)
+from .mixins import (AllowAnyInSafeMethodOrCustomPermissionMixin, ThrottleActionsWithMethodsMixin,
+                     ExpandQuerysetOptimizerMixin)
+
+
+class ProfileViewSet(SerializerMetricsMixin, ExpandQuerysetOptimizerMixin, AllowAnyInSafeMethodOrCustomPermissionMixin,
+                     RetrieveModelMixin, UpdateModelMixin, ListModelMixin, GenericViewSet):
     queryset = Profile.objects.active()
     serializer_class = ProfileSerializer
     filterset_class = ProfileFilter
@@ -38,12 +51,13 @@ class ProfileViewSet(AllowAnyInSafeMethodOrCustomPermissionMixin, RetrieveModelM
         queryset = super().get_queryset()
         if self.action == 'list':
             queryset = queryset.exclude(is_public=False)
-            if is_expanded(self.request, 'links'):
-                queryset = queryset.prefetch_related(
-                    models.Prefetch('links', queryset=SocialLink.objects.filter(is_active=True))
-                )
         return queryset
 
+    def get_prefetch(self, lookup):
+        if self.action == 'list' and lookup == 'links':
+            return models.Prefetch('links', queryset=SocialLink.objects.filter(is_active=True))
+        return super().get_prefetch(lookup)
+
     def get_permission_classes(self, request):
         if self.action == 'me':
             return self.permission_classes
@@ -51,7 +65,10 @@ class ProfileViewSet(AllowAnyInSafeMethodOrCustomPermissionMixin, RetrieveModelM
 
     def get_object(self):
         if self.action == 'me':
-            return self.request.user.profile
+            if self.request.method in SAFE_METHODS:
+                return self.request.user.profile
+            # The authenticated user may come from the cache, don't save changes over a stale profile
+            return Profile.objects.get(user=self.request.user)
         return super(ProfileViewSet, self).get_object()
 
     @action(detail=False, methods=["GET", "PUT", "PATCH"], name='Get My Profile')
@@ -65,15 +82,132 @@ class ProfileViewSet(AllowAnyInSafeMethodOrCustomPermissionMixin, RetrieveModelM
         return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
 
 
-class VisitLogViewSet(AllowAnyInSafeMethodOrCustomPermissionMixin, CreateModelMixin, RetrieveModelMixin, ListModelMixin,
-                      GenericViewSet):
+class ProfileQRCodeAPIView(GenericAPIView):
+    """Get the QR code image of a profile, rendered once and served from the disk afterwards"""
+    queryset = Profile.objects.active()
+    permission_classes = [AllowAny]
+
+    @extend_schema(responses={(200, content_type): OpenApiTypes.BINARY
+                              for content_type in QR_CODE_CONTENT_TYPES.values()})
+    def get(self, request, qr_code, image_format, *args, **kwargs):
+        if not self.get_queryset().filter(qr_code=qr_code).exists():
+            raise NotFound()
+        path = get_qr_code_file(int(qr_code), image_format)
+        response = FileResponse(path.open('rb'), content_type=QR_CODE_CONTENT_TYPES[image_format])
+        # The image of a code never changes, unless the rendering settings do
+        patch_cache_control(response, public=True, max_age=60 * 60 * 24)
+        return response
+
+
+class ProfileAPIView(SerializerMetricsMixin, ExpandQuerysetOptimizerMixin, AsyncAPIViewMixin, GenericAPIView):
+    """
+    Async retrieve of a profile when `ASYNC_VIEWS` is enabled, the other methods of the route are served by
+    `ProfileViewSet`
+    """
+    queryset = Profile.objects.active()
+    serializer_class = ProfileSerializer
+    filterset_class = ProfileFilter
+    permission_classes = [IsUserWithProfile]
+
+    async def get(self, request, *args, **kwargs):
+        instance = await self.aget_object()
+        serializer = self.get_serializer(instance)
+        return Response(serializer.data)
+
+
+class ProfileByQRCodeAPIView(SerializerMetricsMixin, GenericAPIView):
+    queryset = Profile.objects.active()
+    serializer_class = ProfileSerializer
+    permission_classes = [IsUserWithProfile]
+    throttle_classes = [ScanRateThrottle]
+
+    def get(self, request, qr_code, *args, **kwargs):
+        """Get the profile of a scanned QR code, and record the scan as a visit of the profile"""
+        profile = Profile.objects.get_by_qr_code(int(qr_code))
+        if profile is None:
+            raise NotFound()
+
+        visit = self.get_visit(request, profile)
+        if visit is not None:
+            self.save_visit(visit)
+
+        serializer = self.get_serializer(profile)
+        # The cached profile only has its user joined, load the expanded relations before serializing it
+        models.prefetch_related_objects([profile], *self.get_expanded_relations(serializer))
+        return Response(serializer.data)
+
+    @staticmethod
+    def get_visit(request, profile: Profile):
+        visitor = request.user if request.user.is_authenticated else None
+        # Users scanning their own code don't visit their profile
+        if visitor is not None and visitor.pk == profile.user_id:
+            return None
+        return VisitLog(visitor=visitor, profile=profile, is_scanned=True)
+
+    @staticmethod
+    def save_visit(visit: VisitLog):
+        if visit_log_buffer.enabled:
+            visit_log_buffer.append(visit)
+            return
+        try:
+            # The visit & its daily stats are recorded together
+            with transaction.atomic():
+                visit.save()
+        except IntegrityError:
+            # The profile has been deleted since it was cached
+            invalidate_profile_qr_codes([visit.profile.qr_code])
+            raise NotFound()
+
+    @staticmethod
+    def get_expanded_relations(serializer) -> list:
+        select, prefetch = get_serializer_relations(serializer, Profile)
+        return [*select, *prefetch]
+
+
+class AsyncProfileByQRCodeAPIView(AsyncAPIViewMixin, ProfileByQRCodeAPIView):
+    """Same as `ProfileByQRCodeAPIView`, served by an async view when `ASYNC_VIEWS` is enabled"""
+
+    async def get(self, request, qr_code, *args, **kwargs):
+        """Get the profile of a scanned QR code, and record the scan as a visit of the profile"""
+        profile = await Profile.objects.aget_by_qr_code(int(qr_code))
+        if profile is None:
+            raise NotFound()
+
+        visit = self.get_visit(request, profile)
+        if visit is not None:
+            if visit_log_buffer.enabled:
+                self.save_visit(visit)
+            else:
+                await sync_to_async(self.save_visit)(visit)
+
+        serializer = self.get_serializer(profile)
+        relations = self.get_expanded_relations(serializer)
+        if relations:
+            await sync_to_async(models.prefetch_related_objects)([profile], *relations)
+        return Response(serializer.data)
+
+
+class VisitLogViewSet(SerializerMetricsMixin, ExpandQuerysetOptimizerMixin, AllowAnyInSafeMethodOrCustomPermissionMixin,
+                      CreateModelMixin, RetrieveModelMixin, ListModelMixin, GenericViewSet):
     queryset = VisitLog.objects.all()
     serializer_class = VisitLogSerializer
     filterset_class = VisitLogFilter
     permission_classes = [IsUserWithProfile]
 
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        if visit_log_buffer.enabled:
+            # The visit is queued to be written later, not created yet
+            response.status_code = status.HTTP_202_ACCEPTED
+        return response
+
     def perform_create(self, serializer):
-        serializer.save(visitor=self.request.user)
+        if not visit_log_buffer.enabled:
+            serializer.save(visitor=self.request.user)
+            return
+        serializer.instance = visit_log_buffer.append(
+            VisitLog(visitor=self.request.user, **serializer.validated_data)
+        )
 
     def get_permission_classes(self, request):
         if self.action in ('my_visits', 'my_views'):
@@ -83,9 +217,9 @@ class VisitLogViewSet(AllowAnyInSafeMethodOrCustomPermissionMixin, CreateModelMi
     def get_queryset(self):
         queryset = super().get_queryset()
         if self.action == 'my_visits':
-            return queryset.filter(visitor=self.request.user).exclude(hide_from_visitor=True)
+            return queryset.filter(visitor=self.request.user, hide_from_visitor=False)
         elif self.action == 'my_views':
-            return queryset.filter(profile=self.request.user.profile).exclude(hide_from_profile=True)
+            return queryset.filter(profile=self.request.user.profile, hide_from_profile=False)
         return queryset
 
     @extend_schema(responses={200: VisitLogSerializer(many=True)})
@@ -120,7 +254,33 @@ class VisitLogViewSet(AllowAnyInSafeMethodOrCustomPermissionMixin, CreateModelMi
         return Response(status.HTTP_200_OK)
 
 
-class UserViewSet(ThrottleActionsWithMethodsMixin, DjoserUserViewSet):
+class VisitStatViewSet(SerializerMetricsMixin, ListModelMixin, GenericViewSet):
+    queryset = DailyVisitStat.objects.all()
+    serializer_class = DailyVisitStatSerializer
+    filterset_class = DailyVisitStatFilter
+    permission_classes = [IsAuthenticatedWithProfile]
+
+    def get_queryset(self):
+        return super().get_queryset().filter(profile=self.request.user.profile)
+
+    @extend_schema(responses={200: VisitStatSummarySerializer})
+    @action(detail=False, methods=['GET'], name='Get My Visit Stats Summary', url_path='summary')
+    def summary(self, request, *args, **kwargs):
+        """Get the total visits of user profile over the filtered days, read from the daily stats only"""
+        queryset = self.filter_queryset(self.get_queryset())
+        totals = queryset.aggregate(total=models.Sum('total'), scanned=models.Sum('scanned'))
+        visitors = DailyVisitor.objects.filter(profile=request.user.profile)
+        visitors = DailyVisitStatFilter(request.query_params, queryset=visitors).qs
+        serializer = VisitStatSummarySerializer({
+            'total': totals['total'] or 0,
+            'scanned': totals['scanned'] or 0,
+            'unique_visitors': visitors.values('visitor').distinct().count()
+        })
+        return Response(serializer.data)
+
+
+class UserViewSet(SerializerMetricsMixin, ExpandQuerysetOptimizerMixin, ThrottleActionsWithMethodsMixin,
+                  DjoserUserViewSet):
     queryset = User.objects.with_profile()
     filterset_class = UserFilter
     throttle_classes = [UpdateRateThrottle]
@@ -136,6 +296,12 @@ class UserViewSet(ThrottleActionsWithMethodsMixin, DjoserUserViewSet):
             queryset = queryset.exclude(id=user.id)
         return queryset
 
+    def get_instance(self):
+        if self.request.method in SAFE_METHODS:
+            return super().get_instance()
+        # The authenticated user may come from the cache, don't save changes over a stale user
+        return User.objects.get(pk=self.request.user.pk)
+
     def perform_destroy(self, instance):
         if getattr(settings, 'SEND_USER_DELETE_CONFIRMATION', True):
             context = {"user": instance}
@@ -147,8 +313,9 @@ class UserViewSet(ThrottleActionsWithMethodsMixin, DjoserUserViewSet):
     def set_username(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        user = self.request.user
+        user = self.get_instance()
         new_username = serializer.data["new_" + User.USERNAME_FIELD]
+        old_user_id = getattr(user, get_user_id_field())
 
         setattr(user, User.USERNAME_FIELD, new_username)
         email_field_name = get_user_email_field_name(user)
@@ -160,6 +327,8 @@ class UserViewSet(ThrottleActionsWithMethodsMixin, DjoserUserViewSet):
                 sender=self.__class__, user=user, request=self.request
             )
         user.save()
+        # Tokens issued for the old subject must not resolve to the cached user anymore
+        invalidate_auth_users([old_user_id])
 
         context = {"user": user}
         to = [get_user_email(user)]
@@ -178,6 +347,7 @@ class UserViewSet(ThrottleActionsWithMethodsMixin, DjoserUserViewSet):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         new_username = serializer.data["new_" + User.USERNAME_FIELD]
+        old_user_id = getattr(serializer.user, get_user_id_field())
 
         setattr(serializer.user, User.USERNAME_FIELD, new_username)
         if hasattr(serializer.user, "last_login"):
@@ -193,6 +363,8 @@ class UserViewSet(ThrottleActionsWithMethodsMixin, DjoserUserViewSet):
                 sender=self.__class__, user=user, request=self.request
             )
         user.save()
+        # Tokens issued for the old subject must not resolve to the cached user anymore
+        invalidate_auth_users([old_user_id])
 
         context = {"user": user}
         to = [get_user_email(user)]
@@ -207,8 +379,8 @@ class UserViewSet(ThrottleActionsWithMethodsMixin, DjoserUserViewSet):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class SocialLinkViewSet(AllowAnyInSafeMethodOrCustomPermissionMixin, CreateModelMixin, UpdateModelMixin,
-                        DestroyModelMixin, ListModelMixin, GenericViewSet):
+class SocialLinkViewSet(SerializerMetricsMixin, AllowAnyInSafeMethodOrCustomPermissionMixin, CreateModelMixin,
+                        UpdateModelMixin, DestroyModelMixin, ListModelMixin, GenericViewSet):
     queryset = SocialLink.objects.all()
     serializer_class = SocialLinkSerializer
     permission_classes = [IsUserWithProfile]
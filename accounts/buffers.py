@@ -0,0 +1,139 @@
+import atexit
+import logging
+import threading
+from typing import List
+
+from django.conf import settings
+from django.db import close_old_connections, IntegrityError
+
+from .models import VisitLog, DailyVisitStat
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VISIT_LOG_BUFFER = {
+    'ENABLED': False,
+    'MAX_SIZE': 500,
+    'FLUSH_INTERVAL': 5,
+    'BATCH_SIZE': 500,
+    # Visits kept for the next flush while the database is unreachable, the oldest ones are dropped beyond it
+    'MAX_PENDING': 10000,
+}
+
+
+class VisitLogBuffer:
+    """
+    Collect visit logs in memory and write them with `bulk_create`, either when the buffer reaches `MAX_SIZE` or every
+    `FLUSH_INTERVAL` seconds from a background thread. Pending visits are drained when the process exits, and kept
+    for the next flush, up to `MAX_PENDING` of them, while the database is unreachable.
+    """
+
+    def __init__(self):
+        self._visits: List[VisitLog] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    @property
+    def config(self) -> dict:
+        return {**DEFAULT_VISIT_LOG_BUFFER, **getattr(settings, 'VISIT_LOG_BUFFER', {})}
+
+    @property
+    def enabled(self) -> bool:
+        return self.config['ENABLED']
+
+    def __len__(self):
+        return len(self._visits)
+
+    def append(self, visit: VisitLog) -> VisitLog:
+        self._start()
+        with self._lock:
+            self._visits.append(visit)
+            is_full = len(self._visits) >= self.config['MAX_SIZE']
+        if is_full:
+            self._wakeup.set()
+        return visit
+
+    def flush(self) -> int:
+        """Write all pending visits to the database, return the number of written visits"""
+        with self._flush_lock:
+            with self._lock:
+                visits, self._visits = self._visits, []
+            if not visits:
+                return 0
+            try:
+                VisitLog.objects.bulk_create(visits, batch_size=self.config['BATCH_SIZE'])
+                failed = False
+            except IntegrityError:
+                logger.exception('Failed to flush %d visit logs at once, writing them one by one', len(visits))
+                failed = True
+            except Exception:
+                # Likely an unreachable database, the next flush retries the whole batch
+                logger.exception('Failed to flush %d visit logs, keeping them for the next flush', len(visits))
+                self._requeue(visits)
+                return 0
+            if failed:
+                visits = self._create_one_by_one(visits)
+            try:
+                # bulk_create doesn't send post_save, so the daily stats are updated here
+                DailyVisitStat.objects.record(visits)
+            except Exception:
+                logger.exception('Failed to record the daily stats of %d visit logs, run `backfill_visit_stats` to '
+                                 'rebuild them', len(visits))
+            return len(visits)
+
+    def _create_one_by_one(self, visits: List[VisitLog]) -> List[VisitLog]:
+        """Write the visits separately, so an invalid one, e.g. of a deleted profile, only loses itself"""
+        created = []
+        for index, visit in enumerate(visits):
+            # The failed batch may have set the ids of the visits before being rolled back
+            visit.pk, visit._state.adding = None, True
+            try:
+                VisitLog.objects.bulk_create([visit])
+            except IntegrityError:
+                logger.exception('Failed to write the visit log of the profile %s', visit.profile_id)
+            except Exception:
+                logger.exception('Failed to write %d visit logs, keeping them for the next flush', len(visits) - index)
+                self._requeue(visits[index:])
+                break
+            else:
+                created.append(visit)
+        return created
+
+    def _requeue(self, visits: List[VisitLog]):
+        for visit in visits:
+            visit.pk, visit._state.adding = None, True
+        with self._lock:
+            self._visits[:0] = visits
+            dropped = len(self._visits) - self.config['MAX_PENDING']
+            if dropped > 0:
+                del self._visits[:dropped]
+        if dropped > 0:
+            logger.error('Dropped the %d oldest pending visit logs, the buffer is full', dropped)
+
+    def _start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                if self._thread is None:
+                    atexit.register(self.flush)
+                self._thread = threading.Thread(target=self._run, name='visit-log-flusher', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.config['FLUSH_INTERVAL'])
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                # Keep the thread alive, the pending visits are retried on the next flush
+                logger.exception('Failed to flush the visit logs')
+            finally:
+                # The thread keeps its own connection, make sure it doesn't outlive CONN_MAX_AGE nor an error
+                close_old_connections()
+
+
+visit_log_buffer = VisitLogBuffer()
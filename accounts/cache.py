@@ -0,0 +1,45 @@
+import hashlib
+from typing import Iterable
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+DEFAULT_AUTH_USER_CACHE_TIMEOUT = 60
+DEFAULT_PROFILE_QR_CODE_CACHE_TIMEOUT = 60 * 5
+
+
+def get_user_id_field() -> str:
+    """Name of the user field the JWT subject is read from"""
+    return getattr(settings, 'SIMPLE_JWT', {}).get('USER_ID_FIELD', 'id')
+
+
+def get_auth_user_cache_timeout() -> int:
+    return getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', DEFAULT_AUTH_USER_CACHE_TIMEOUT)
+
+
+def get_auth_user_cache_key(user_id) -> str:
+    # The subject is an email, hash it to keep the key valid for every cache backend
+    return f'auth:user:{hashlib.md5(str(user_id).encode()).hexdigest()}'
+
+
+def invalidate_auth_users(user_ids: Iterable):
+    """Drop the cached users of the given token subjects, the next request loads them from the database"""
+    cache.delete_many([get_auth_user_cache_key(user_id) for user_id in user_ids])
+
+
+def invalidate_auth_user(user):
+    invalidate_auth_users([getattr(user, get_user_id_field())])
+
+
+def get_profile_qr_code_cache_timeout() -> int:
+    return getattr(settings, 'PROFILE_QR_CODE_CACHE_TIMEOUT', DEFAULT_PROFILE_QR_CODE_CACHE_TIMEOUT)
+
+
+def get_profile_qr_code_cache_key(qr_code) -> str:
+    return f'profile:qr_code:{qr_code}'
+
+
+def invalidate_profile_qr_codes(qr_codes: Iterable):
+    """Drop the cached profiles of the given qr codes, the next scan loads them from the database"""
+    cache.delete_many([get_profile_qr_code_cache_key(qr_code) for qr_code in qr_codes])
@@ -1,16 +1,18 @@
 from django.forms.models import model_to_dict
+from django.core.mail.backends.base import BaseEmailBackend
 from templated_mail.mail import BaseEmailMessage
 from djoser.email import (ActivationEmail, ConfirmationEmail, PasswordResetEmail, PasswordChangedConfirmationEmail,
                           UsernameChangedConfirmationEmail, UsernameResetEmail)
 
-from info.models import MainInfo
+from info.utils import get_main_info
+from .models import OutboxEmail
 
 
 class AttachMainInfoEmailMixin:
     main_info_context_name = 'main_info'
 
     def get_main_info_data(self):
-        main_info = MainInfo.objects.first()
+        main_info = get_main_info()
         return model_to_dict(main_info) if main_info else {}
 
     def get_context_data(self):
@@ -45,3 +47,16 @@ class CustomUsernameChangedConfirmationEmail(AttachMainInfoEmailMixin, UsernameC
 
 class CustomUsernameResetEmail(AttachMainInfoEmailMixin, UsernameResetEmail):
     ...
+
+
+class OutboxEmailBackend(BaseEmailBackend):
+    """
+    Email backend that stores the messages in the outbox instead of sending them,
+    they are sent later by the `send_queued_mail` command through `OUTBOX_EMAIL_BACKEND`.
+    """
+
+    def send_messages(self, email_messages):
+        if not email_messages:
+            return 0
+        emails = OutboxEmail.objects.bulk_create([OutboxEmail.from_message(message) for message in email_messages])
+        return len(emails)
@@ -25,3 +25,21 @@ class SocialLinkIconChoice(models.TextChoices):
     DRIBBBLE = 'dribbble.com', 'dribbble'
     TWITCH = 'twitch.com', 'twitch'
     OTHER = 'globe', ''
+
+
+class OutboxEmailStatusChoice(models.TextChoices):
+    PENDING = "P", _("Pending")
+    SENT = "S", _("Sent")
+    FAILED = "F", _("Failed")
+
+
+class BulkEmailChoice(models.TextChoices):
+    ACTIVATION = "activation", _("Activation")
+    CONFIRMATION = "confirmation", _("Confirmation")
+
+
+class JobStatusChoice(models.TextChoices):
+    PENDING = "P", _("Pending")
+    RUNNING = "R", _("Running")
+    DONE = "D", _("Done")
+    FAILED = "F", _("Failed")
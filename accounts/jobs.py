@@ -0,0 +1,87 @@
+import logging
+
+from django.db import transaction
+from django.db.models.functions import Now
+from django.conf import settings as django_settings
+from django.contrib.sites.shortcuts import get_current_site
+
+from djoser.conf import settings
+from djoser.compat import get_user_email
+
+from .models import User, OutboxEmail, BulkEmailJob
+from .enums import JobStatusChoice
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BULK_EMAIL_CHUNK_SIZE = 200
+
+
+def get_email_context(request) -> dict:
+    """The parts of the email context taken from the request, so the emails can be rendered without it"""
+    site = get_current_site(request)
+    return {
+        'domain': getattr(django_settings, 'DOMAIN', '') or site.domain,
+        'protocol': 'https' if request.is_secure() else 'http',
+        'site_name': getattr(django_settings, 'SITE_NAME', '') or site.name,
+    }
+
+
+def build_user_email(email_class, context, user):
+    """Render a djoser email for the user, ready to be sent through any connection"""
+    message = email_class(context={**context, 'user': user})
+    message.render()
+    message.to = [get_user_email(user)]
+    message.from_email = django_settings.DEFAULT_FROM_EMAIL
+    return message
+
+
+def get_bulk_email_chunk_size() -> int:
+    return getattr(django_settings, 'BULK_EMAIL_CHUNK_SIZE', DEFAULT_BULK_EMAIL_CHUNK_SIZE)
+
+
+def start_bulk_email_job(request, queryset, email) -> BulkEmailJob:
+    """
+    Save a job sending the email to the users of the queryset, the `send_queued_mail` worker queues the emails in the
+    outbox in chunks & sends them. The progress is saved on the returned job.
+    """
+    user_ids = list(queryset.order_by('pk').values_list('pk', flat=True))
+    return BulkEmailJob.objects.create(email=email, total=len(user_ids), user_ids=user_ids,
+                                       context=get_email_context(request))
+
+
+def queue_bulk_email_chunk(chunk_size: int) -> int:
+    """
+    Queue the emails of the next chunk of users of the oldest unfinished job in the outbox, return the number of
+    processed users. A job interrupted with its worker is resumed from its last queued chunk by the next worker.
+    """
+    job = BulkEmailJob.objects.filter(
+        status__in=[JobStatusChoice.PENDING, JobStatusChoice.RUNNING]
+    ).order_by('create_at', 'id').first()
+    if job is None:
+        return 0
+
+    user_ids = job.user_ids[job.processed:job.processed + chunk_size]
+    try:
+        email_class = getattr(settings.EMAIL, job.email)
+        # Users deleted since the job was started are skipped
+        emails = [
+            OutboxEmail.from_message(build_user_email(email_class, job.context, user))
+            for user in User.objects.filter(pk__in=user_ids).order_by('pk')
+        ]
+    except Exception as error:
+        logger.exception('Bulk email job %s failed', job.pk)
+        BulkEmailJob.objects.filter(pk=job.pk).update(status=JobStatusChoice.FAILED, last_error=str(error))
+        return 0
+
+    processed = job.processed + len(user_ids)
+    with transaction.atomic():
+        # The chunk & the progress are saved together, only once when several workers rendered the same chunk
+        updated = BulkEmailJob.objects.filter(pk=job.pk, processed=job.processed).update(
+            processed=processed,
+            status=JobStatusChoice.DONE if processed >= job.total else JobStatusChoice.RUNNING,
+            update_at=Now(),
+        )
+        if updated:
+            OutboxEmail.objects.bulk_create(emails)
+    return len(user_ids) if updated else 0
@@ -0,0 +1,50 @@
+from django.db import transaction
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+from django.core.management.base import BaseCommand
+
+from accounts.models import VisitLog, DailyVisitStat, DailyVisitor
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily visit stats of profiles from the visit logs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=str, default=None,
+                            help='Only rebuild the days starting from this date (YYYY-MM-DD)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Number of rows to insert at a time')
+
+    def handle(self, *args, **options):
+        since, batch_size = options['since'], options['batch_size']
+
+        visits = VisitLog.objects.filter(profile__isnull=False).annotate(date=TruncDate('create_at'))
+        stats, visitors = DailyVisitStat.objects.all(), DailyVisitor.objects.all()
+        if since:
+            visits = visits.filter(date__gte=since)
+            stats, visitors = stats.filter(date__gte=since), visitors.filter(date__gte=since)
+
+        daily_stats = visits.order_by().values('profile', 'date').annotate(
+            total=Count('id'),
+            scanned=Count('id', filter=Q(is_scanned=True)),
+            unique_visitors=Count('visitor', distinct=True),
+        )
+        daily_visitors = visits.filter(visitor__isnull=False).order_by().values('profile', 'date', 'visitor').distinct()
+
+        with transaction.atomic():
+            stats.delete()
+            visitors.delete()
+            created_stats = DailyVisitStat.objects.bulk_create(
+                (DailyVisitStat(profile_id=row['profile'], date=row['date'], total=row['total'],
+                                scanned=row['scanned'], unique_visitors=row['unique_visitors'])
+                 for row in daily_stats.iterator()),
+                batch_size=batch_size
+            )
+            created_visitors = DailyVisitor.objects.bulk_create(
+                (DailyVisitor(profile_id=row['profile'], date=row['date'], visitor_id=row['visitor'])
+                 for row in daily_visitors.iterator()),
+                batch_size=batch_size
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully rebuilt {len(created_stats)} daily stats and {len(created_visitors)} daily visitors'
+        ))
@@ -0,0 +1,50 @@
+import os
+import csv
+from io import StringIO
+from itertools import repeat
+from zipfile import ZipFile, ZIP_STORED, ZIP_DEFLATED
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from accounts.models import Profile
+from core.qr_codes import QR_CODE_CONTENT_TYPES, get_qr_code_options, render_qr_code_files
+
+
+class Command(BaseCommand):
+    help = 'Render the QR codes of the active profiles in parallel, and write them to a single zip file ' \
+           'with a `profiles.csv` sheet of their owners'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', type=str, help='Path of the zip file to write')
+        parser.add_argument('--format', choices=list(QR_CODE_CONTENT_TYPES), default='png', help='Image format')
+        parser.add_argument('--qr-codes', type=int, nargs='+', default=None, help='Only render these QR codes')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Number of worker processes')
+        parser.add_argument('--batch-size', type=int, default=200, help='Number of QR codes per worker task')
+
+    def handle(self, *args, **options):
+        image_format, batch_size = options['format'], options['batch_size']
+
+        profiles = Profile.objects.active().order_by('qr_code')
+        if options['qr_codes']:
+            profiles = profiles.filter(qr_code__in=options['qr_codes'])
+        rows = list(profiles.values_list('qr_code', 'user__first_name', 'user__last_name', 'user__email'))
+
+        sheet = StringIO()
+        writer = csv.writer(sheet)
+        writer.writerow(['qr_code', 'first_name', 'last_name', 'email', 'file'])
+        writer.writerows([*row, f'{row[0]}.{image_format}'] for row in rows)
+
+        qr_codes = [row[0] for row in rows]
+        batches = [qr_codes[i:i + batch_size] for i in range(0, len(qr_codes), batch_size)]
+        # PNG images are compressed already
+        compression = ZIP_STORED if image_format == 'png' else ZIP_DEFLATED
+        with ZipFile(options['output'], 'w', compression=compression) as archive, \
+                ProcessPoolExecutor(max(options['workers'], 1)) as executor:
+            for files in executor.map(render_qr_code_files, batches, repeat(image_format),
+                                      repeat(get_qr_code_options())):
+                for qr_code, data in files:
+                    archive.writestr(f'{qr_code}.{image_format}', data)
+            archive.writestr('profiles.csv', sheet.getvalue(), compress_type=ZIP_DEFLATED)
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully wrote {len(qr_codes)} QR codes to {options["output"]}'))
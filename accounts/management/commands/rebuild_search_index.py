@@ -0,0 +1,35 @@
+from django.db import transaction
+from django.core.management.base import BaseCommand
+
+from accounts.models import User, SearchToken
+from accounts.search import USER_SEARCH_FIELDS, PROFILE_SEARCH_FIELDS, tokenize
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the search tokens of all users and their profiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Number of users to index at a time')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        users = User.objects.values_list(
+            'id', *USER_SEARCH_FIELDS, *(f'profile__{field}' for field in PROFILE_SEARCH_FIELDS)
+        )
+        fields = (*USER_SEARCH_FIELDS, *PROFILE_SEARCH_FIELDS)
+
+        count = 0
+        with transaction.atomic():
+            SearchToken.objects.all().delete()
+            tokens = []
+            for user_id, *values in users.iterator(chunk_size=batch_size):
+                tokens.extend(
+                    SearchToken(user_id=user_id, field=field, token=token)
+                    for field, value in zip(fields, values) for token in tokenize(value)
+                )
+                if len(tokens) >= batch_size:
+                    count += len(SearchToken.objects.bulk_create(tokens))
+                    tokens = []
+            count += len(SearchToken.objects.bulk_create(tokens))
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully indexed {count} search tokens'))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from core.images import image_variant_fields, update_image_variants
+
+
+class Command(BaseCommand):
+    help = 'Generate the missing or outdated resized variants of the uploaded images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Regenerate the variants that are up to date too')
+        parser.add_argument('--batch-size', type=int, default=100, help='Number of instances to load at a time')
+
+    def handle(self, *args, **options):
+        count = 0
+        for model, field_name, kind in image_variant_fields:
+            queryset = model._base_manager.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+            for instance in queryset.iterator(chunk_size=options['batch_size']):
+                try:
+                    updated = update_image_variants(instance, field_name, kind, force=options['force'])
+                except Exception as error:
+                    self.stderr.write(f'Failed to generate the variants of {model.__name__} {instance.pk} '
+                                      f'{field_name}: {error}')
+                else:
+                    count += updated
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully generated the variants of {count} images'))
@@ -0,0 +1,91 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.timezone import now
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+
+from accounts.models import OutboxEmail
+from accounts.enums import OutboxEmailStatusChoice
+from accounts.jobs import queue_bulk_email_chunk, get_bulk_email_chunk_size
+
+
+class Command(BaseCommand):
+    help = ('Send the queued outbox emails in batches over a single connection, retrying failures with backoff, '
+            'and queue the emails of the bulk email jobs started from the admin')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Number of emails to send at a time')
+        parser.add_argument('--interval', type=float, default=5, help='Seconds to wait when there is nothing to send')
+        parser.add_argument('--max-attempts', type=int, default=5, help='Attempts before an email is marked failed')
+        parser.add_argument('--retry-delay', type=int, default=60,
+                            help='Seconds to wait before the first retry, doubled on every further attempt')
+        parser.add_argument('--lease', type=int, default=300,
+                            help='Seconds a batch is reserved to the worker, longer than sending a batch takes')
+        parser.add_argument('--once', action='store_true', help='Send a single batch and exit')
+
+    def handle(self, *args, **options):
+        while True:
+            queued = queue_bulk_email_chunk(get_bulk_email_chunk_size())
+            sent = self.send_batch(options['batch_size'], options['max_attempts'], options['retry_delay'],
+                                   options['lease'])
+            if options['once']:
+                break
+            if not queued and not sent:
+                time.sleep(options['interval'])
+
+    def send_batch(self, batch_size, max_attempts, retry_delay, lease) -> int:
+        emails = self.claim_batch(batch_size, lease)
+        if not emails:
+            return 0
+
+        # Sent outside of any transaction, so the database isn't locked during the SMTP round trips
+        connection = get_connection(settings.OUTBOX_EMAIL_BACKEND)
+        try:
+            connection.open()
+        except Exception as error:
+            for email in emails:
+                self.fail(email, error, max_attempts, retry_delay)
+        else:
+            try:
+                for email in emails:
+                    try:
+                        connection.send_messages([email.to_message(connection)])
+                    except Exception as error:
+                        self.fail(email, error, max_attempts, retry_delay)
+                    else:
+                        email.status = OutboxEmailStatusChoice.SENT
+                        email.sent_at = now()
+            finally:
+                connection.close()
+
+        with transaction.atomic():
+            OutboxEmail.objects.bulk_update(emails, ['status', 'attempts', 'last_error', 'send_after', 'sent_at'])
+
+        sent = sum(email.status == OutboxEmailStatusChoice.SENT for email in emails)
+        self.stdout.write(f'Sent {sent} of {len(emails)} emails')
+        return len(emails)
+
+    def claim_batch(self, batch_size, lease) -> list:
+        """
+        Lease the next due emails to this worker, by moving their `send_after` forward for `lease` seconds.
+        Emails of a worker that stops before recording its results are sent again once their lease ends.
+        """
+        with transaction.atomic():
+            # Locked rows are being claimed by another worker
+            emails = list(OutboxEmail.objects.due().select_for_update(skip_locked=True)[:batch_size])
+            send_after = now() + timedelta(seconds=lease)
+            for email in emails:
+                email.send_after = send_after
+            OutboxEmail.objects.bulk_update(emails, ['send_after'])
+        return emails
+
+    def fail(self, email, error, max_attempts, retry_delay):
+        email.attempts += 1
+        email.last_error = str(error)
+        if email.attempts >= max_attempts:
+            email.status = OutboxEmailStatusChoice.FAILED
+        else:
+            email.send_after = now() + timedelta(seconds=retry_delay * 2 ** (email.attempts - 1))
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.2 on 2026-10-18 20:07
+
+from django.db import migrations, models
+
+
+def create_qr_code_sequence(apps, schema_editor):
+    Profile = apps.get_model('accounts', 'Profile')
+    QRCodeSequence = apps.get_model('accounts', 'QRCodeSequence')
+    max_qr_code = Profile.objects.aggregate(models.Max('qr_code'))['qr_code__max'] or 0
+    QRCodeSequence.objects.create(pk=1, last_value=max_qr_code)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0015_remove_profile_position_remove_user_nick_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QRCodeSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_value', models.PositiveIntegerField(default=0, verbose_name='Last Reserved Value')),
+            ],
+            options={
+                'verbose_name': 'QR Code Sequence',
+                'verbose_name_plural': 'QR Code Sequences',
+            },
+        ),
+        migrations.RunPython(create_qr_code_sequence, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.2 on 2026-10-18 20:07
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0016_qrcodesequence'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='visitlog',
+            name='create_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Creation Date'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 4.2.2 on 2026-10-18 20:08
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0017_alter_visitlog_create_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyVisitStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Date')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Total Visits')),
+                ('scanned', models.PositiveIntegerField(default=0, verbose_name='Scanned Visits')),
+                ('unique_visitors', models.PositiveIntegerField(default=0, verbose_name='Unique Visitors')),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_visit_stats', to='accounts.profile', verbose_name='Profile')),
+            ],
+            options={
+                'verbose_name': 'Daily Visit Stat',
+                'verbose_name_plural': 'Daily Visit Stats',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyVisitor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Date')),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_visitors', to='accounts.profile', verbose_name='Profile')),
+                ('visitor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_visits', to=settings.AUTH_USER_MODEL, verbose_name='Visitor')),
+            ],
+            options={
+                'verbose_name': 'Daily Visitor',
+                'verbose_name_plural': 'Daily Visitors',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailyvisitstat',
+            constraint=models.UniqueConstraint(fields=('profile', 'date'), name='unique_profile_daily_visit_stat'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyvisitor',
+            constraint=models.UniqueConstraint(fields=('profile', 'date', 'visitor'), name='unique_profile_daily_visitor'),
+        ),
+    ]
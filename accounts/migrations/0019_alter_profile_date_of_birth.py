@@ -0,0 +1,18 @@
+# Generated by Django 4.2.2 on 2026-10-18 20:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0018_dailyvisitstat_dailyvisitor'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='profile',
+            name='date_of_birth',
+            field=models.DateField(blank=True, db_index=True, null=True, verbose_name='Date of Birth'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.2 on 2026-10-18 20:11
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0019_alter_profile_date_of_birth'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.CharField(max_length=50, verbose_name='Field')),
+                ('token', models.CharField(max_length=100, verbose_name='Token')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+            options={
+                'verbose_name': 'Search Token',
+                'verbose_name_plural': 'Search Tokens',
+                'indexes': [models.Index(fields=['token', 'field'], name='search_token_field_idx')],
+            },
+        ),
+    ]
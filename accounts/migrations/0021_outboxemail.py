@@ -0,0 +1,42 @@
+# Generated by Django 4.2.2 on 2026-10-18 20:13
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0020_searchtoken'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxEmail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.TextField(blank=True, verbose_name='Subject')),
+                ('body', models.TextField(blank=True, verbose_name='Body')),
+                ('content_subtype', models.CharField(default='plain', max_length=50, verbose_name='Content Subtype')),
+                ('alternatives', models.JSONField(blank=True, default=list, verbose_name='Alternatives')),
+                ('from_email', models.CharField(blank=True, max_length=254, verbose_name='From')),
+                ('to', models.JSONField(blank=True, default=list, verbose_name='To')),
+                ('cc', models.JSONField(blank=True, default=list, verbose_name='Cc')),
+                ('bcc', models.JSONField(blank=True, default=list, verbose_name='Bcc')),
+                ('reply_to', models.JSONField(blank=True, default=list, verbose_name='Reply To')),
+                ('headers', models.JSONField(blank=True, default=dict, verbose_name='Headers')),
+                ('status', models.CharField(choices=[('P', 'Pending'), ('S', 'Sent'), ('F', 'Failed')], default='P', max_length=1, verbose_name='Status')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Attempts')),
+                ('last_error', models.TextField(blank=True, null=True, verbose_name='Last Error')),
+                ('send_after', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Send After')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='Sending Date')),
+                ('create_at', models.DateTimeField(auto_now_add=True, verbose_name='Creation Date')),
+            ],
+            options={
+                'verbose_name': 'Outbox Email',
+                'verbose_name_plural': 'Outbox Emails',
+                'ordering': ['-create_at'],
+                'indexes': [models.Index(fields=['status', 'send_after'], name='outbox_email_due_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.2 on 2026-10-18 20:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0021_outboxemail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BulkEmailJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', models.CharField(choices=[('activation', 'Activation'), ('confirmation', 'Confirmation')], max_length=50, verbose_name='Email')),
+                ('status', models.CharField(choices=[('P', 'Pending'), ('R', 'Running'), ('D', 'Done'), ('F', 'Failed')], default='P', max_length=1, verbose_name='Status')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Total Users')),
+                ('processed', models.PositiveIntegerField(default=0, verbose_name='Processed Users')),
+                ('last_error', models.TextField(blank=True, null=True, verbose_name='Last Error')),
+                ('create_at', models.DateTimeField(auto_now_add=True, verbose_name='Creation Date')),
+                ('update_at', models.DateTimeField(auto_now=True, verbose_name='Update Date')),
+            ],
+            options={
+                'verbose_name': 'Bulk Email Job',
+                'verbose_name_plural': 'Bulk Email Jobs',
+                'ordering': ['-create_at'],
+            },
+        ),
+    ]
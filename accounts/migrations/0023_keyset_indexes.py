@@ -0,0 +1,29 @@
+# Generated by Django 4.2.2 on 2026-10-18 20:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0022_bulkemailjob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(fields=['-create_at', '-id'], name='profile_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sociallink',
+            index=models.Index(fields=['profile', '-create_at', '-id'], name='social_link_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='visitlog',
+            index=models.Index(fields=['visitor', '-create_at', '-id'], name='visit_log_visitor_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='visitlog',
+            index=models.Index(fields=['profile', '-create_at', '-id'], name='visit_log_profile_keyset_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.2 on 2026-10-18 20:18
+
+from django.db import migrations, models
+
+
+def fill_null_hide_flags(apps, schema_editor):
+    VisitLog = apps.get_model('accounts', 'VisitLog')
+    VisitLog.objects.filter(hide_from_visitor__isnull=True).update(hide_from_visitor=False)
+    VisitLog.objects.filter(hide_from_profile__isnull=True).update(hide_from_profile=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0023_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_null_hide_flags, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='visitlog',
+            name='visit_log_visitor_keyset_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='visitlog',
+            name='visit_log_profile_keyset_idx',
+        ),
+        migrations.AlterField(
+            model_name='visitlog',
+            name='hide_from_profile',
+            field=models.BooleanField(blank=True, default=False, verbose_name='Hide From Profile'),
+        ),
+        migrations.AlterField(
+            model_name='visitlog',
+            name='hide_from_visitor',
+            field=models.BooleanField(blank=True, default=False, verbose_name='Hide From Visitor'),
+        ),
+        migrations.AddIndex(
+            model_name='visitlog',
+            index=models.Index(fields=['-create_at', '-id'], name='visit_log_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='visitlog',
+            index=models.Index(condition=models.Q(('hide_from_visitor', False)), fields=['visitor', '-create_at', '-id'], name='visit_log_visitor_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='visitlog',
+            index=models.Index(condition=models.Q(('hide_from_profile', False)), fields=['profile', '-create_at', '-id'], name='visit_log_profile_keyset_idx'),
+        ),
+    ]
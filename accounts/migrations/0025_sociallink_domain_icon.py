@@ -0,0 +1,76 @@
+# Generated by Django 4.2.2 on 2026-10-18 20:23
+
+from urllib.parse import urlparse
+
+from django.db import migrations, models
+
+
+# Copied from `accounts.utils` & `SocialLinkIconChoice` at the time of this migration, so later changes of them
+# don't change what it fills
+SOCIAL_LINK_ICONS = {
+    'facebook.com': 'facebook-square',
+    'twitter.com': 'twitter-square',
+    'linkedin.com': 'linkedin-square',
+    'snapchat.com': 'snapchat-square',
+    'behance.com': 'behance-square',
+    'github.com': 'github-square',
+    'pinterest.com': 'pinterest-square',
+    'whatsapp.com': 'whatsapp',
+    'instagram.com': 'instagram',
+    'tiktok.com': 'tiktok',
+    'discord.com': 'discord',
+    'telegram.com': 'telegram',
+    'youtube.com': 'youtube-play',
+    'dribbble.com': 'dribbble',
+    'twitch.com': 'twitch',
+}
+OTHER_ICON = 'globe'
+
+
+def get_hostname_from_url(url):
+    hostname = urlparse(url).hostname
+    if not hostname:
+        return ''
+    if hostname.startswith('www.'):
+        hostname = hostname[4:]
+    return hostname
+
+
+def get_icon_from_hostname(hostname):
+    while hostname:
+        icon = SOCIAL_LINK_ICONS.get(hostname)
+        if icon is not None:
+            return icon
+        hostname = hostname.partition('.')[2]
+    return OTHER_ICON
+
+
+def fill_domain_and_icon(apps, schema_editor):
+    SocialLink = apps.get_model('accounts', 'SocialLink')
+    links = []
+    for link in SocialLink.objects.only('id', 'url').iterator(chunk_size=1000):
+        link.domain = get_hostname_from_url(link.url)
+        link.icon = get_icon_from_hostname(link.domain)
+        links.append(link)
+    SocialLink.objects.bulk_update(links, ['domain', 'icon'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0024_visitlog_partial_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sociallink',
+            name='domain',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255, verbose_name='Domain'),
+        ),
+        migrations.AddField(
+            model_name='sociallink',
+            name='icon',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=50, verbose_name='Icon'),
+        ),
+        migrations.RunPython(fill_domain_and_icon, migrations.RunPython.noop),
+    ]
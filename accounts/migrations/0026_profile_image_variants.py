@@ -0,0 +1,23 @@
+# Generated by Django 4.2.2 on 2026-10-18 20:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0025_sociallink_domain_icon'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='cover_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Cover Image Variants'),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Image Variants'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.2 on 2026-10-18 21:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0026_profile_image_variants'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='searchtoken',
+            name='search_token_field_idx',
+        ),
+        migrations.AddIndex(
+            model_name='searchtoken',
+            index=models.Index(fields=['token', 'field'], name='search_token_field_idx', opclasses=['varchar_pattern_ops', 'varchar_pattern_ops']),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.2 on 2026-10-18 21:30
+
+from django.db import migrations, models
+
+
+def fail_unfinished_jobs(apps, schema_editor):
+    # Jobs started by the web workers can't be resumed, their users weren't saved
+    BulkEmailJob = apps.get_model('accounts', 'BulkEmailJob')
+    BulkEmailJob.objects.filter(status__in=['P', 'R']).update(
+        status='F', last_error='Interrupted before the jobs were run by the outbox worker'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0027_searchtoken_pattern_ops_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bulkemailjob',
+            name='context',
+            field=models.JSONField(default=dict, editable=False, verbose_name='Email Context'),
+        ),
+        migrations.AddField(
+            model_name='bulkemailjob',
+            name='user_ids',
+            field=models.JSONField(default=list, editable=False, verbose_name='User IDs'),
+        ),
+        migrations.RunPython(fail_unfinished_jobs, migrations.RunPython.noop),
+    ]
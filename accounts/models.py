@@ -1,13 +1,26 @@
-from django.db import models
-from django.db.models.signals import post_save
+import operator
+from functools import reduce
+from collections import defaultdict
+from typing import Iterable
+
+from django.db import models, DEFAULT_DB_ALIAS
+from django.core.cache import cache
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
+from django.core.mail import EmailMultiAlternatives
 from django.contrib.auth.models import AbstractUser, UserManager
-from django.utils.timezone import localdate
+from django.utils.timezone import localdate, now
 from django.utils.translation import gettext_lazy as _
 
 from phonenumber_field.modelfields import PhoneNumberField
 
-from .enums import GenderChoice
+from core.images import register_image_variants, image_variants_updated
+
+from .enums import GenderChoice, OutboxEmailStatusChoice, BulkEmailChoice, JobStatusChoice
+from .cache import (get_user_id_field, invalidate_auth_user, invalidate_auth_users, get_profile_qr_code_cache_key,
+                    get_profile_qr_code_cache_timeout, invalidate_profile_qr_codes)
+from .signals import user_deactivated
 
 
 class CustomUserManager(UserManager):
@@ -55,8 +68,39 @@ class ProfilerQuerySet(models.QuerySet):
             )
         )
 
+    @staticmethod
+    def years_before(day, years):
+        try:
+            return day.replace(year=day.year - years)
+        except ValueError:
+            # 29th of February in a non leap year
+            return day.replace(year=day.year - years, day=28)
+
+    def birth_date_range(self, start, end):
+        """
+        Translate an inclusive age window into the exclusive lower & inclusive upper bounds of `date_of_birth`,
+        so filtering by age can use the date of birth index instead of computing the age for every row.
+        """
+        current_date = localdate()
+        return self.years_before(current_date, int(end) + 1), self.years_before(current_date, int(start))
+
     def age_range(self, start, end):
-        return self.with_age().filter(calculated_age__gte=start, calculated_age__lte=end)
+        min_date, max_date = self.birth_date_range(start, end)
+        return self.filter(date_of_birth__gt=min_date, date_of_birth__lte=max_date)
+
+    def age_buckets(self, ranges):
+        """Count profiles in each of the given (start, end) age windows with a single grouped query"""
+        whens = []
+        for start, end in ranges:
+            min_date, max_date = self.birth_date_range(start, end)
+            whens.append(models.When(date_of_birth__gt=min_date, date_of_birth__lte=max_date,
+                                     then=models.Value(f'{start},{end}')))
+        counts = self.filter(date_of_birth__isnull=False).annotate(
+            age_bucket=models.Case(*whens, default=None, output_field=models.CharField())
+        ).order_by().values('age_bucket').annotate(count=models.Count('id'))
+        buckets = {f'{start},{end}': 0 for start, end in ranges}
+        buckets.update({row['age_bucket']: row['count'] for row in counts if row['age_bucket'] is not None})
+        return buckets
 
 
 class ProfileManager(models.Manager):
@@ -67,9 +111,34 @@ class ProfileManager(models.Manager):
     def active(self, *args, **kwargs):
         return super().get_queryset(*args, **kwargs).filter(user__is_active=True)
 
+    def get_by_qr_code(self, qr_code: int):
+        """Get the active profile of the qr code, through a cache invalidated when the profile or its user change"""
+        cache_key = get_profile_qr_code_cache_key(qr_code)
+        profile = cache.get(cache_key)
+        if profile is None:
+            # Unknown codes are cached too, creating their profile invalidates them. Read from the primary, a replica
+            # may still have the profile that a change has just dropped from the cache
+            queryset = self.active().using(DEFAULT_DB_ALIAS).select_related('user').filter(qr_code=qr_code)
+            profile = queryset.first() or False
+            cache.set(cache_key, profile, get_profile_qr_code_cache_timeout())
+        return profile or None
+
+    async def aget_by_qr_code(self, qr_code: int):
+        """Same as `get_by_qr_code`, for async views"""
+        cache_key = get_profile_qr_code_cache_key(qr_code)
+        profile = await cache.aget(cache_key)
+        if profile is None:
+            queryset = self.active().using(DEFAULT_DB_ALIAS).select_related('user').filter(qr_code=qr_code)
+            profile = await queryset.afirst() or False
+            await cache.aset(cache_key, profile, get_profile_qr_code_cache_timeout())
+        return profile or None
+
     def age_range(self, start, end):
         return self.get_queryset().age_range(start, end)
 
+    def age_buckets(self, ranges):
+        return self.get_queryset().age_buckets(ranges)
+
 
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile', verbose_name=_('User'))
@@ -82,10 +151,12 @@ class Profile(models.Model):
     address = models.CharField(max_length=200, null=True, blank=True, verbose_name=_('Address'))
     image = models.ImageField(null=True, blank=True, upload_to='images/', verbose_name=_('Image'))
     cover = models.ImageField(null=True, blank=True, upload_to='covers/', verbose_name=_('Cover Image'))
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, verbose_name=_('Image Variants'))
+    cover_variants = models.JSONField(default=dict, blank=True, editable=False, verbose_name=_('Cover Image Variants'))
     qr_code = models.PositiveIntegerField(unique=True, default=0, verbose_name=_('QR Code'))
     gender = models.CharField(choices=GenderChoice.choices, default=GenderChoice.MALE, null=True, blank=True,
                               max_length=100, verbose_name=_('Gender'))
-    date_of_birth = models.DateField(null=True, blank=True, verbose_name=_('Date of Birth'))
+    date_of_birth = models.DateField(null=True, blank=True, db_index=True, verbose_name=_('Date of Birth'))
     create_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Creation Date'))
     update_at = models.DateTimeField(auto_now=True, verbose_name=_('Update Date'))
 
@@ -98,6 +169,9 @@ class Profile(models.Model):
         verbose_name = _('Profile')
         verbose_name_plural = _('Profiles')
         ordering = ['-create_at', '-update_at']
+        indexes = [
+            models.Index(fields=['-create_at', '-id'], name='profile_keyset_idx')
+        ]
 
     @property
     def age(self) -> int:
@@ -112,20 +186,238 @@ class VisitLog(models.Model):
                                 verbose_name=_('Visitor'))
     profile = models.ForeignKey(Profile, null=True, on_delete=models.CASCADE, related_name='visits',
                                 verbose_name=_('Visited Profile'))
-    hide_from_visitor = models.BooleanField(null=True, blank=True, default=False, verbose_name=_('Hide From Visitor'))
-    hide_from_profile = models.BooleanField(null=True, blank=True, default=False, verbose_name=_('Hide From Profile'))
+    hide_from_visitor = models.BooleanField(blank=True, default=False, verbose_name=_('Hide From Visitor'))
+    hide_from_profile = models.BooleanField(blank=True, default=False, verbose_name=_('Hide From Profile'))
     is_scanned = models.BooleanField(default=False, blank=True, verbose_name=_('Is scanned by qr code'))
-    create_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Creation Date'))
+    # Not auto_now_add, buffered visits are written later but keep the time they were made at
+    create_at = models.DateTimeField(default=now, editable=False, verbose_name=_('Creation Date'))
 
     class Meta:
         verbose_name = _('Visit Log')
         verbose_name_plural = _('Visit Logs')
         ordering = ['-create_at', ]
+        indexes = [
+            models.Index(fields=['-create_at', '-id'], name='visit_log_keyset_idx'),
+            # Visits made by a user, and visits of a profile, that are not hidden from them
+            models.Index(fields=['visitor', '-create_at', '-id'], condition=models.Q(hide_from_visitor=False),
+                         name='visit_log_visitor_keyset_idx'),
+            models.Index(fields=['profile', '-create_at', '-id'], condition=models.Q(hide_from_profile=False),
+                         name='visit_log_profile_keyset_idx'),
+        ]
+
+
+class DailyVisitStatManager(models.Manager):
+
+    def record(self, visits: Iterable[VisitLog]):
+        """
+        Add the given newly created visits to the daily counters of the visited profiles, with a fixed number of
+        queries whatever the number of visits is.
+        """
+        counters = defaultdict(lambda: {'total': 0, 'scanned': 0})
+        visitors = set()
+        for visit in visits:
+            if visit.profile_id is None:
+                continue
+            key = (visit.profile_id, localdate(visit.create_at))
+            counters[key]['total'] += 1
+            counters[key]['scanned'] += int(bool(visit.is_scanned))
+            if visit.visitor_id is not None:
+                visitors.add((*key, visit.visitor_id))
+        if not counters:
+            return
+
+        DailyVisitor.objects.bulk_create([
+            DailyVisitor(profile_id=profile_id, date=date, visitor_id=visitor_id)
+            for profile_id, date, visitor_id in visitors
+        ], ignore_conflicts=True)
+        # Create the missing day rows, then update all of them at once
+        self.bulk_create([self.model(profile_id=profile_id, date=date) for profile_id, date in counters],
+                         ignore_conflicts=True)
+        conditions = {key: models.Q(profile_id=key[0], date=key[1]) for key in counters}
+
+        def increment(name):
+            return models.Case(*(
+                models.When(condition, then=models.F(name) + counters[key][name])
+                for key, condition in conditions.items()
+            ), default=models.F(name), output_field=models.PositiveIntegerField())
+
+        # Counted from the daily visitors, a visitor recorded by another worker meanwhile is counted once
+        unique_visitors = DailyVisitor.objects.filter(
+            profile_id=models.OuterRef('profile_id'), date=models.OuterRef('date')
+        ).order_by().values('profile_id', 'date').annotate(count=models.Count('*')).values('count')
+        self.filter(reduce(operator.or_, conditions.values())).update(
+            total=increment('total'),
+            scanned=increment('scanned'),
+            unique_visitors=Coalesce(models.Subquery(unique_visitors, output_field=models.PositiveIntegerField()), 0),
+        )
+
+
+class DailyVisitStat(models.Model):
+    profile = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='daily_visit_stats',
+                                verbose_name=_('Profile'))
+    date = models.DateField(verbose_name=_('Date'))
+    total = models.PositiveIntegerField(default=0, verbose_name=_('Total Visits'))
+    scanned = models.PositiveIntegerField(default=0, verbose_name=_('Scanned Visits'))
+    unique_visitors = models.PositiveIntegerField(default=0, verbose_name=_('Unique Visitors'))
+
+    objects = DailyVisitStatManager()
+
+    class Meta:
+        verbose_name = _('Daily Visit Stat')
+        verbose_name_plural = _('Daily Visit Stats')
+        ordering = ['-date', ]
+        constraints = [
+            models.UniqueConstraint(fields=['profile', 'date'], name='unique_profile_daily_visit_stat')
+        ]
+
+
+class DailyVisitor(models.Model):
+    profile = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='daily_visitors',
+                                verbose_name=_('Profile'))
+    date = models.DateField(verbose_name=_('Date'))
+    visitor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_visits', verbose_name=_('Visitor'))
+
+    class Meta:
+        verbose_name = _('Daily Visitor')
+        verbose_name_plural = _('Daily Visitors')
+        constraints = [
+            models.UniqueConstraint(fields=['profile', 'date', 'visitor'], name='unique_profile_daily_visitor')
+        ]
+
+
+class SearchToken(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='search_tokens', verbose_name=_('User'))
+    field = models.CharField(max_length=50, verbose_name=_('Field'))
+    token = models.CharField(max_length=100, verbose_name=_('Token'))
+
+    class Meta:
+        verbose_name = _('Search Token')
+        verbose_name_plural = _('Search Tokens')
+        indexes = [
+            # The pattern operator classes let PostgreSQL walk the index for `startswith`, ignored by the other databases
+            models.Index(fields=['token', 'field'], name='search_token_field_idx',
+                         opclasses=['varchar_pattern_ops', 'varchar_pattern_ops'])
+        ]
+
+    def __str__(self):
+        return self.token
+
+
+class OutboxEmailManager(models.Manager):
+
+    def due(self):
+        return self.filter(status=OutboxEmailStatusChoice.PENDING, send_after__lte=now()).order_by('send_after', 'id')
+
+
+class OutboxEmail(models.Model):
+    subject = models.TextField(blank=True, verbose_name=_('Subject'))
+    body = models.TextField(blank=True, verbose_name=_('Body'))
+    content_subtype = models.CharField(max_length=50, default='plain', verbose_name=_('Content Subtype'))
+    alternatives = models.JSONField(default=list, blank=True, verbose_name=_('Alternatives'))
+    from_email = models.CharField(max_length=254, blank=True, verbose_name=_('From'))
+    to = models.JSONField(default=list, blank=True, verbose_name=_('To'))
+    cc = models.JSONField(default=list, blank=True, verbose_name=_('Cc'))
+    bcc = models.JSONField(default=list, blank=True, verbose_name=_('Bcc'))
+    reply_to = models.JSONField(default=list, blank=True, verbose_name=_('Reply To'))
+    headers = models.JSONField(default=dict, blank=True, verbose_name=_('Headers'))
+    status = models.CharField(choices=OutboxEmailStatusChoice.choices, default=OutboxEmailStatusChoice.PENDING,
+                              max_length=1, verbose_name=_('Status'))
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name=_('Attempts'))
+    last_error = models.TextField(null=True, blank=True, verbose_name=_('Last Error'))
+    send_after = models.DateTimeField(default=now, verbose_name=_('Send After'))
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name=_('Sending Date'))
+    create_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Creation Date'))
+
+    objects = OutboxEmailManager()
+
+    class Meta:
+        verbose_name = _('Outbox Email')
+        verbose_name_plural = _('Outbox Emails')
+        ordering = ['-create_at', ]
+        indexes = [
+            models.Index(fields=['status', 'send_after'], name='outbox_email_due_idx')
+        ]
+
+    def __str__(self):
+        return self.subject
+
+    @classmethod
+    def from_message(cls, message):
+        """Build an outbox email from a rendered email message, attachments are not supported"""
+        return cls(
+            subject=message.subject,
+            body=message.body,
+            content_subtype=message.content_subtype,
+            alternatives=[list(alternative) for alternative in getattr(message, 'alternatives', [])],
+            from_email=message.from_email or '',
+            to=list(message.to),
+            cc=list(message.cc),
+            bcc=list(message.bcc),
+            reply_to=list(message.reply_to),
+            headers=message.extra_headers,
+        )
+
+    def to_message(self, connection=None):
+        message = EmailMultiAlternatives(
+            subject=self.subject,
+            body=self.body,
+            from_email=self.from_email or None,
+            to=self.to,
+            cc=self.cc,
+            bcc=self.bcc,
+            reply_to=self.reply_to,
+            headers=self.headers,
+            alternatives=[tuple(alternative) for alternative in self.alternatives],
+            connection=connection,
+        )
+        message.content_subtype = self.content_subtype
+        return message
+
+
+class BulkEmailJob(models.Model):
+    email = models.CharField(choices=BulkEmailChoice.choices, max_length=50, verbose_name=_('Email'))
+    status = models.CharField(choices=JobStatusChoice.choices, default=JobStatusChoice.PENDING, max_length=1,
+                              verbose_name=_('Status'))
+    total = models.PositiveIntegerField(default=0, verbose_name=_('Total Users'))
+    processed = models.PositiveIntegerField(default=0, verbose_name=_('Processed Users'))
+    last_error = models.TextField(null=True, blank=True, verbose_name=_('Last Error'))
+    # The emailed users & the request parts of the email context, the job is run later by the outbox worker
+    user_ids = models.JSONField(default=list, editable=False, verbose_name=_('User IDs'))
+    context = models.JSONField(default=dict, editable=False, verbose_name=_('Email Context'))
+    create_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Creation Date'))
+    update_at = models.DateTimeField(auto_now=True, verbose_name=_('Update Date'))
+
+    class Meta:
+        verbose_name = _('Bulk Email Job')
+        verbose_name_plural = _('Bulk Email Jobs')
+        ordering = ['-create_at', ]
+
+    def __str__(self):
+        return f'{self.get_email_display()} - {self.processed}/{self.total}'
+
+    @property
+    def progress(self) -> int:
+        if not self.total:
+            return 100
+        return int(self.processed * 100 / self.total)
+
+
+class QRCodeSequence(models.Model):
+    last_value = models.PositiveIntegerField(default=0, verbose_name=_('Last Reserved Value'))
+
+    class Meta:
+        verbose_name = _('QR Code Sequence')
+        verbose_name_plural = _('QR Code Sequences')
+
+    def __str__(self):
+        return str(self.last_value)
 
 
 class SocialLink(models.Model):
     profile = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='links', verbose_name=_('Profile'))
     url = models.URLField(blank=False, null=False, verbose_name=_('Link'))
+    domain = models.CharField(max_length=255, blank=True, editable=False, db_index=True, verbose_name=_('Domain'))
+    icon = models.CharField(max_length=50, blank=True, editable=False, db_index=True, verbose_name=_('Icon'))
     is_active = models.BooleanField(default=True, blank=True, verbose_name=_('Active'),
                                     help_text=_('Designates whether this link is viewed at the profile'))
     create_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Creation Date'))
@@ -135,19 +427,86 @@ class SocialLink(models.Model):
         verbose_name = _('Social Link')
         verbose_name_plural = _('Social Links')
         ordering = ('-create_at', '-update_at')
+        indexes = [
+            models.Index(fields=['profile', '-create_at', '-id'], name='social_link_keyset_idx')
+        ]
 
     def __str__(self):
         return self.domain
 
-    @property
-    def domain(self):
-        from .utils import get_hostname_from_url
-        return get_hostname_from_url(self.url)
+    def save(self, *args, **kwargs):
+        from .utils import get_hostname_from_url, get_icon_from_hostname
+        self.domain = get_hostname_from_url(self.url)
+        self.icon = get_icon_from_hostname(self.domain)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'url' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'domain', 'icon'}
+        super().save(*args, **kwargs)
+
+
+register_image_variants(Profile, 'image', 'avatar')
+register_image_variants(Profile, 'cover', 'cover')
 
 
 @receiver(post_save, sender=User)
 def create_profile(sender, instance, created, *args, **kwargs):
     if instance and created and not (instance.is_staff or instance.is_superuser):
-        max_qr_code = Profile.objects.aggregate(models.Max('qr_code'))['qr_code__max']
-        new_qr_code = 1 if max_qr_code is None else max_qr_code + 1
-        instance.profile = Profile.objects.create(user=instance, qr_code=new_qr_code)
+        from .qr_code import qr_code_allocator
+        instance.profile = Profile.objects.create(user=instance, qr_code=qr_code_allocator.allocate())
+
+
+@receiver(post_save, sender=VisitLog)
+def record_visit_stats(sender, instance, created, *args, **kwargs):
+    if instance and created:
+        DailyVisitStat.objects.record([instance])
+
+
+@receiver(post_save, sender=User)
+def index_user_search_tokens(sender, instance, created, update_fields=None, *args, **kwargs):
+    from .search import USER_SEARCH_FIELDS, update_search_index
+    if update_fields and not set(update_fields) & set(USER_SEARCH_FIELDS):
+        return
+    update_search_index(instance.pk, {field: getattr(instance, field) for field in USER_SEARCH_FIELDS})
+
+
+@receiver(post_save, sender=Profile)
+def index_profile_search_tokens(sender, instance, created, update_fields=None, *args, **kwargs):
+    from .search import PROFILE_SEARCH_FIELDS, update_search_index
+    if update_fields and not set(update_fields) & set(PROFILE_SEARCH_FIELDS):
+        return
+    update_search_index(instance.user_id, {field: getattr(instance, field) for field in PROFILE_SEARCH_FIELDS})
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_cached_user(sender, instance, *args, **kwargs):
+    invalidate_auth_user(instance)
+
+
+@receiver(user_deactivated)
+def invalidate_deactivated_user(sender, user, *args, **kwargs):
+    invalidate_auth_user(user)
+
+
+@receiver([post_save, post_delete, image_variants_updated], sender=Profile)
+def invalidate_cached_profile_user(sender, instance, *args, **kwargs):
+    if Profile.user.is_cached(instance):
+        invalidate_auth_user(instance.user)
+    else:
+        invalidate_auth_users(User.objects.filter(pk=instance.user_id).values_list(get_user_id_field(), flat=True))
+
+
+@receiver([post_save, post_delete, image_variants_updated], sender=Profile)
+def invalidate_cached_qr_code_profile(sender, instance, *args, **kwargs):
+    invalidate_profile_qr_codes([instance.qr_code])
+
+
+@receiver(post_save, sender=User)
+def invalidate_cached_qr_code_user(sender, instance, created, *args, **kwargs):
+    if created:
+        return
+    if User.profile.is_cached(instance):
+        profile = getattr(instance, 'profile', None)
+        qr_codes = [profile.qr_code] if profile is not None else []
+    else:
+        qr_codes = Profile.objects.filter(user=instance).values_list('qr_code', flat=True)
+    invalidate_profile_qr_codes(qr_codes)
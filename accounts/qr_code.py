@@ -0,0 +1,69 @@
+import threading
+
+from django.conf import settings
+from django.db import models, transaction
+
+from .models import Profile, QRCodeSequence
+
+
+DEFAULT_QR_CODE_BLOCK_SIZE = 100
+
+
+class QRCodeAllocator:
+    """
+    Hand out unique qr codes from blocks reserved on `QRCodeSequence`.
+    Each worker leases a block of codes with a single UPDATE and serves the block from memory, so signups neither
+    scan the profiles table nor race each other on the unique constraint.
+    Codes left in a block when the worker exits are never used, so gaps in the sequence are expected.
+    """
+
+    def __init__(self, block_size: int = None):
+        self._block_size = block_size
+        self._lock = threading.Lock()
+        self._next_value = 0
+        self._last_value = -1
+
+    @property
+    def block_size(self) -> int:
+        if self._block_size is not None:
+            return self._block_size
+        return getattr(settings, 'QR_CODE_BLOCK_SIZE', DEFAULT_QR_CODE_BLOCK_SIZE)
+
+    def reserve_block(self, size: int):
+        """Reserve the next `size` codes and return the first & last values of the block"""
+        with transaction.atomic():
+            updated = QRCodeSequence.objects.filter(pk=1).update(last_value=models.F('last_value') + size)
+            if not updated:
+                # First reservation ever, start after the largest code that has been already given
+                max_qr_code = Profile.objects.aggregate(models.Max('qr_code'))['qr_code__max'] or 0
+                QRCodeSequence.objects.create(pk=1, last_value=max_qr_code + size)
+            last_value = QRCodeSequence.objects.values_list('last_value', flat=True).get(pk=1)
+        return last_value - size + 1, last_value
+
+    def allocate(self) -> int:
+        with self._lock:
+            if self._next_value > self._last_value:
+                first_value, last_value = self.reserve_block(self.block_size)
+                if transaction.get_connection().in_atomic_block:
+                    # The reservation is rolled back with the transaction of the caller, and the block would be
+                    # reserved again by another worker, only keep the rest of the block once the reservation commits
+                    transaction.on_commit(lambda: self._keep_block(first_value + 1, last_value))
+                    return first_value
+                self._next_value, self._last_value = first_value, last_value
+            value = self._next_value
+            self._next_value += 1
+        return value
+
+    def _keep_block(self, next_value: int, last_value: int):
+        with self._lock:
+            # Another committed reservation may have replaced the block in between, its codes are used first
+            if self._next_value > self._last_value:
+                self._next_value, self._last_value = next_value, last_value
+
+    def reset(self):
+        """Drop the codes left in the current block, the next allocation reserves a new one"""
+        with self._lock:
+            self._next_value, self._last_value = 0, -1
+
+
+qr_code_allocator = QRCodeAllocator()
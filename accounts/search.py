@@ -0,0 +1,63 @@
+import re
+import operator
+from functools import reduce
+from typing import Dict, Iterable, Set
+
+from django.db import models, transaction, connections
+
+from .models import SearchToken
+
+
+USER_SEARCH_FIELDS = ('first_name', 'last_name', 'email', 'username')
+PROFILE_SEARCH_FIELDS = ('bio', )
+
+TOKEN_MAX_LENGTH = SearchToken._meta.get_field('token').max_length
+# Upper bound of every token starting with a given prefix, in the binary collation of SQLite
+TOKEN_PREFIX_END = '\U0010ffff'
+
+
+def tokenize(value: str) -> Set[str]:
+    """Split a value into lower case words, EG.: `John.Doe@mail.com` -> {'john', 'doe', 'mail', 'com'}"""
+    return {token[:TOKEN_MAX_LENGTH] for token in re.split(r'\W+', (value or '').lower()) if token}
+
+
+def update_search_index(user_id: int, values: Dict[str, str]):
+    """Replace the search tokens of the given fields of a user"""
+    with transaction.atomic():
+        SearchToken.objects.filter(user_id=user_id, field__in=values.keys()).delete()
+        SearchToken.objects.bulk_create([
+            SearchToken(user_id=user_id, field=field, token=token)
+            for field, value in values.items() for token in tokenize(value)
+        ])
+
+
+def prefix_match(tokens_lookup: str, term: str, vendor: str) -> models.Q:
+    """Match the tokens starting with the term, with a lookup that walks the token index of the database"""
+    if vendor == 'sqlite':
+        # The `LIKE ... ESCAPE` of `startswith` scans the table, while the byte order of SQLite bounds a prefix exactly
+        return models.Q(**{f'{tokens_lookup}__token__gte': term,
+                           f'{tokens_lookup}__token__lt': term + TOKEN_PREFIX_END})
+    # Walks the `varchar_pattern_ops` index on PostgreSQL, whatever the collation of the database is
+    return models.Q(**{f'{tokens_lookup}__token__startswith': term})
+
+
+def search(queryset, value: str, fields: Iterable[str], tokens_lookup: str = 'search_tokens'):
+    """
+    Filter the queryset by the users having words, in the given fields, that start with every word of the value.
+    Results are ranked by the number of matched words, the token index is used as a prefix scan instead of scanning
+    the searched columns with `icontains`.
+    """
+    terms = tokenize(value)
+    if not terms:
+        return queryset.none()
+    vendor = connections[queryset.db].vendor
+    matches, matched_terms = models.Q(), []
+    for term in terms:
+        term_match = prefix_match(tokens_lookup, term, vendor)
+        matches |= term_match
+        # A word may match several terms, e.g. `jo` & `john`, count every term once
+        matched_terms.append(models.Max(models.Case(models.When(term_match, then=1), default=0)))
+    return queryset.filter(matches, **{f'{tokens_lookup}__field__in': fields}).annotate(
+        search_terms=reduce(operator.add, matched_terms),
+        search_rank=models.Count(f'{tokens_lookup}__id'),
+    ).filter(search_terms=len(terms)).order_by('-search_rank', 'pk')
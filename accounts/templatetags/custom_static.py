@@ -1,3 +1,5 @@
+from urllib.parse import urljoin
+
 from django import template
 from django.templatetags.static import static
 
@@ -7,5 +9,8 @@ register = template.Library()
 
 @register.simple_tag(takes_context=True)
 def absolute_static(context, path):
-    request = context['request']
-    return request.build_absolute_uri(static(path))
+    request = context.get('request')
+    if request is not None:
+        return request.build_absolute_uri(static(path))
+    # Emails rendered outside of a request, e.g. by the bulk email jobs, have the domain & protocol in their context
+    return urljoin(f"{context['protocol']}://{context['domain']}/", static(path))
@@ -1,3 +1,490 @@
-from django.test import TestCase
+import time
+import pickle
+import tempfile
+import threading
+from unittest import mock
+from datetime import timedelta
 
-# Create your tests here.
+from django.core import mail
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import call_command
+from django.db import OperationalError, connection, transaction
+from django.db.models import QuerySet
+from django.test import TestCase, TransactionTestCase, RequestFactory, override_settings
+from django.utils.timezone import localdate, now
+
+from core.cache import DatabaseCache, FileBasedCache
+from core.throttling import FixedWindowRateThrottle
+from .admin import AgeProfileListFilter
+from .jobs import start_bulk_email_job, queue_bulk_email_chunk
+from .enums import JobStatusChoice, BulkEmailChoice
+from .buffers import VisitLogBuffer
+from .qr_code import QRCodeAllocator
+from .search import search, USER_SEARCH_FIELDS, PROFILE_SEARCH_FIELDS
+from .models import (User, Profile, ProfilerQuerySet, VisitLog, DailyVisitStat, DailyVisitor, OutboxEmail, BulkEmailJob,
+                     QRCodeSequence)
+
+
+def create_users(count, prefix='user'):
+    return [
+        User.objects.create_user(email=f'{prefix}{i}@finder.com', username=f'{prefix}{i}', password='password')
+        for i in range(count)
+    ]
+
+
+class QRCodeAllocatorTests(TransactionTestCase):
+    """Allocated outside of a test transaction, so the reservations really commit or roll back"""
+
+    def setUp(self):
+        self.allocator = QRCodeAllocator(block_size=5)
+
+    def test_codes_are_served_from_the_reserved_block(self):
+        first = self.allocator.allocate()
+        with self.assertNumQueries(0):
+            codes = [self.allocator.allocate() for _ in range(4)]
+        self.assertEqual(codes, list(range(first + 1, first + 5)))
+
+        self.assertEqual(self.allocator.allocate(), first + 5)
+        self.assertEqual(QRCodeSequence.objects.get(pk=1).last_value, first + 9)
+
+    def test_first_block_starts_after_the_given_codes(self):
+        user, = create_users(1)
+        QRCodeSequence.objects.all().delete()
+        self.assertEqual(self.allocator.allocate(), user.profile.qr_code + 1)
+
+    def test_workers_reserve_distinct_blocks(self):
+        other_allocator = QRCodeAllocator(block_size=5)
+        codes = [allocator.allocate() for _ in range(7) for allocator in (self.allocator, other_allocator)]
+        self.assertEqual(len(set(codes)), len(codes))
+
+    def test_block_reserved_in_a_committed_transaction_is_reused(self):
+        with transaction.atomic():
+            first = self.allocator.allocate()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.allocator.allocate(), first + 1)
+
+    def test_block_reserved_in_a_rolled_back_transaction_is_dropped(self):
+        with self.assertRaises(ValueError), transaction.atomic():
+            first = self.allocator.allocate()
+            raise ValueError()
+        # The reservation is rolled back, so the block is reserved again instead of being served twice
+        self.assertEqual(self.allocator.allocate(), first)
+        self.assertEqual(self.allocator.allocate(), first + 1)
+        self.assertEqual(QRCodeSequence.objects.get(pk=1).last_value, first + 4)
+
+    def test_signups_get_unique_codes(self):
+        users = create_users(12)
+        qr_codes = set(Profile.objects.filter(user__in=users).values_list('qr_code', flat=True))
+        self.assertEqual(len(qr_codes), len(users))
+
+
+@override_settings(VISIT_LOG_BUFFER={'ENABLED': True, 'MAX_SIZE': 500, 'FLUSH_INTERVAL': 60, 'MAX_PENDING': 10})
+class VisitLogBufferTests(TransactionTestCase):
+    """Flushed outside of a test transaction, so the foreign keys are checked when the batch commits"""
+
+    def setUp(self):
+        self.visitor, self.user = create_users(2)
+        self.buffer = VisitLogBuffer()
+        # The flushes are made by the tests, not by the background thread
+        self.buffer._start = lambda: None
+
+    def append(self, count, **kwargs):
+        for i in range(count):
+            self.buffer.append(VisitLog(profile=self.user.profile, visitor=self.visitor, is_scanned=i % 2 == 0,
+                                        **kwargs))
+
+    def test_flush(self):
+        self.append(3)
+        self.assertEqual(self.buffer.flush(), 3)
+        self.assertEqual(len(self.buffer), 0)
+        self.assertEqual(VisitLog.objects.count(), 3)
+        self.assertEqual(self.buffer.flush(), 0)
+
+        stat = DailyVisitStat.objects.get(profile=self.user.profile, date=localdate())
+        self.assertEqual((stat.total, stat.scanned, stat.unique_visitors), (3, 2, 1))
+
+    def test_flush_writes_the_valid_visits_of_a_failed_batch(self):
+        self.append(2)
+        self.buffer.append(VisitLog(profile_id=self.user.profile.pk + 1000, visitor=self.visitor))
+        self.append(1)
+        with self.assertLogs('accounts.buffers', 'ERROR'):
+            self.assertEqual(self.buffer.flush(), 3)
+        self.assertEqual(VisitLog.objects.filter(profile=self.user.profile).count(), 3)
+        self.assertEqual(VisitLog.objects.count(), 3)
+        self.assertEqual(DailyVisitStat.objects.get(profile=self.user.profile).total, 3)
+
+    def test_flush_keeps_the_visits_while_the_database_is_unreachable(self):
+        self.append(4)
+        with mock.patch.object(QuerySet, 'bulk_create', side_effect=OperationalError), \
+                self.assertLogs('accounts.buffers', 'ERROR'):
+            self.assertEqual(self.buffer.flush(), 0)
+        self.assertEqual(len(self.buffer), 4)
+        self.assertEqual(VisitLog.objects.count(), 0)
+
+        self.assertEqual(self.buffer.flush(), 4)
+        self.assertEqual(VisitLog.objects.count(), 4)
+        self.assertEqual(DailyVisitStat.objects.get(profile=self.user.profile).total, 4)
+
+    def test_flush_drops_the_oldest_visits_beyond_max_pending(self):
+        self.append(8, hide_from_visitor=True)
+        self.append(8)
+        with mock.patch.object(QuerySet, 'bulk_create', side_effect=OperationalError), \
+                self.assertLogs('accounts.buffers', 'ERROR'):
+            self.buffer.flush()
+        self.assertEqual(len(self.buffer), 10)
+
+        self.assertEqual(self.buffer.flush(), 10)
+        self.assertEqual(VisitLog.objects.filter(hide_from_visitor=True).count(), 2)
+
+    def test_flush_keeps_the_visits_when_the_stats_fail(self):
+        self.append(2)
+        with mock.patch.object(DailyVisitStat.objects, 'record', side_effect=OperationalError), \
+                self.assertLogs('accounts.buffers', 'ERROR'):
+            self.assertEqual(self.buffer.flush(), 2)
+        self.assertEqual(VisitLog.objects.count(), 2)
+        self.assertEqual(len(self.buffer), 0)
+
+    def test_flusher_thread_survives_a_failed_flush(self):
+        with mock.patch.object(self.buffer, 'flush', side_effect=[OperationalError, SystemExit]), \
+                mock.patch.object(self.buffer._wakeup, 'wait'), self.assertLogs('accounts.buffers', 'ERROR'):
+            with self.assertRaises(SystemExit):
+                self.buffer._run()
+
+    def test_start_restarts_a_dead_flusher_thread(self):
+        buffer = VisitLogBuffer()
+        with mock.patch('accounts.buffers.threading.Thread') as thread, \
+                mock.patch('accounts.buffers.atexit') as at_exit:
+            buffer._start()
+            thread.return_value.is_alive.return_value = True
+            buffer._start()
+            self.assertEqual(thread.call_count, 1)
+
+            thread.return_value.is_alive.return_value = False
+            buffer._start()
+            self.assertEqual(thread.call_count, 2)
+        # Drained once when the process exits, whatever the number of started threads
+        at_exit.register.assert_called_once_with(buffer.flush)
+
+
+class DailyVisitStatTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.first, cls.second, cls.visitor, cls.other_visitor = create_users(4)
+
+    def get_stats(self, user):
+        return list(DailyVisitStat.objects.filter(profile=user.profile).order_by('date')
+                    .values_list('date', 'total', 'scanned', 'unique_visitors'))
+
+    def test_record(self):
+        yesterday = now() - timedelta(days=1)
+        DailyVisitStat.objects.record([
+            VisitLog(profile=self.first.profile, visitor=self.visitor, is_scanned=True),
+            VisitLog(profile=self.first.profile, visitor=self.visitor),
+            VisitLog(profile=self.first.profile, visitor=None, is_scanned=True),
+            VisitLog(profile=self.first.profile, visitor=self.visitor, create_at=yesterday),
+            VisitLog(profile=self.second.profile, visitor=self.other_visitor),
+            VisitLog(profile=None, visitor=self.visitor),
+        ])
+        self.assertEqual(self.get_stats(self.first), [
+            (localdate(yesterday), 1, 0, 1),
+            (localdate(), 3, 2, 1),
+        ])
+        self.assertEqual(self.get_stats(self.second), [(localdate(), 1, 0, 1)])
+
+    def test_record_increments_the_existing_counters(self):
+        DailyVisitStat.objects.record([VisitLog(profile=self.first.profile, visitor=self.visitor, is_scanned=True)])
+        DailyVisitStat.objects.record([
+            VisitLog(profile=self.first.profile, visitor=self.visitor),
+            VisitLog(profile=self.first.profile, visitor=self.other_visitor, is_scanned=True),
+            VisitLog(profile=self.second.profile, visitor=self.visitor),
+        ])
+        self.assertEqual(self.get_stats(self.first), [(localdate(), 3, 2, 2)])
+        self.assertEqual(self.get_stats(self.second), [(localdate(), 1, 0, 1)])
+        self.assertEqual(DailyVisitor.objects.filter(profile=self.first.profile).count(), 2)
+
+    def test_record_runs_a_fixed_number_of_queries(self):
+        visits = [
+            VisitLog(profile=profile, visitor=visitor, is_scanned=i % 2 == 0, create_at=now() - timedelta(days=i % 3))
+            for i in range(50) for profile, visitor in [(self.first.profile, self.visitor),
+                                                        (self.second.profile, self.other_visitor)]
+        ]
+        with self.assertNumQueries(3):
+            DailyVisitStat.objects.record(visits)
+        with self.assertNumQueries(0):
+            DailyVisitStat.objects.record([])
+        self.assertEqual(sum(total for _, total, _, _ in self.get_stats(self.first)), 50)
+
+    def test_created_visit_is_recorded(self):
+        VisitLog.objects.create(profile=self.first.profile, visitor=self.visitor, is_scanned=True)
+        VisitLog.objects.create(profile=self.first.profile, visitor=self.visitor)
+        self.assertEqual(self.get_stats(self.first), [(localdate(), 2, 1, 1)])
+
+
+class SearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.john_smith = User.objects.create_user(email='john.smith@finder.com', username='jsmith', password='password',
+                                                  first_name='John', last_name='Smith')
+        cls.john_doe = User.objects.create_user(email='doe@finder.com', username='johnd', password='password',
+                                                first_name='John', last_name='Doe')
+        cls.jane_smith = User.objects.create_user(email='jane@finder.com', username='jane', password='password',
+                                                  first_name='Jane', last_name='Smith')
+
+    def search(self, value, fields=USER_SEARCH_FIELDS):
+        return list(search(User.objects.all(), value, fields))
+
+    def test_every_word_must_match(self):
+        self.assertEqual(self.search('john smith'), [self.john_smith])
+        self.assertEqual(self.search('Smith, Jane'), [self.jane_smith])
+        self.assertEqual(self.search('john jane'), [])
+
+    def test_words_match_as_prefixes(self):
+        self.assertCountEqual(self.search('smi'), [self.john_smith, self.jane_smith])
+        self.assertEqual(self.search('jo sm'), [self.john_smith])
+        self.assertEqual(self.search('mith'), [])
+
+    def test_a_word_matching_several_terms(self):
+        self.assertCountEqual(self.search('jo john'), [self.john_smith, self.john_doe])
+
+    def test_rank(self):
+        # Ordered by the number of matched words, 3 for John Smith & Jane Smith, 2 for John Doe, then by id
+        self.assertEqual(self.search('j'), [self.john_smith, self.jane_smith, self.john_doe])
+
+    def test_empty_search(self):
+        self.assertEqual(self.search(''), [])
+        self.assertEqual(self.search('...'), [])
+
+    def test_index_follows_the_changes(self):
+        self.jane_smith.last_name = 'Brown'
+        self.jane_smith.save()
+        self.assertEqual(self.search('smith'), [self.john_smith])
+        self.assertEqual(self.search('jane brown'), [self.jane_smith])
+
+        profile = self.john_doe.profile
+        profile.bio = 'Photographer in Cairo'
+        profile.save()
+        self.assertEqual(self.search('photo', PROFILE_SEARCH_FIELDS), [self.john_doe])
+        self.assertEqual(self.search('photo'), [])
+
+
+@override_settings(OUTBOX_EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend', ALLOWED_HOSTS=['finder.com'])
+class BulkEmailJobTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = create_users(5)
+
+    def start_job(self):
+        request = RequestFactory().get('/admin/', secure=True, HTTP_HOST='finder.com')
+        return start_bulk_email_job(request, User.objects.all(), BulkEmailChoice.ACTIVATION)
+
+    def test_emails_are_queued_in_chunks(self):
+        job = self.start_job()
+        self.assertEqual((job.status, job.total, job.context['domain']), (JobStatusChoice.PENDING, 5, 'finder.com'))
+
+        self.assertEqual(queue_bulk_email_chunk(2), 2)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed), (JobStatusChoice.RUNNING, 2))
+        self.assertEqual(queue_bulk_email_chunk(2), 2)
+        self.assertEqual(queue_bulk_email_chunk(2), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed), (JobStatusChoice.DONE, 5))
+        self.assertEqual(queue_bulk_email_chunk(2), 0)
+
+        emails = OutboxEmail.objects.order_by('id')
+        self.assertEqual([email.to for email in emails], [[user.email] for user in self.users])
+        self.assertIn('https://finder.com/', emails[0].body)
+
+    def test_chunk_rendered_by_another_worker_is_queued_once(self):
+        job = self.start_job()
+        queue_bulk_email_chunk(3)
+        first = QuerySet.first
+
+        # This worker read the job before the other one queued its first chunk
+        def read_before(queryset):
+            return job if queryset.model is BulkEmailJob else first(queryset)
+
+        with mock.patch.object(QuerySet, 'first', autospec=True, side_effect=read_before):
+            self.assertEqual(queue_bulk_email_chunk(3), 0)
+        self.assertEqual(OutboxEmail.objects.count(), 3)
+        self.assertEqual(queue_bulk_email_chunk(3), 2)
+        self.assertEqual(OutboxEmail.objects.count(), 5)
+
+    def test_deleted_users_are_skipped(self):
+        job = self.start_job()
+        self.users[1].delete()
+        self.assertEqual(queue_bulk_email_chunk(10), 5)
+        job.refresh_from_db()
+        self.assertEqual(job.status, JobStatusChoice.DONE)
+        self.assertEqual(OutboxEmail.objects.count(), 4)
+
+    def test_outbox_worker_runs_the_jobs(self):
+        self.start_job()
+        call_command('send_queued_mail', '--once', stdout=mock.MagicMock())
+        self.assertEqual(len(mail.outbox), 5)
+
+
+class ProfileAgeTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ages = [5, 17, 18, 29, 30, 30, 39, 45, 85]
+        for user, age in zip(create_users(len(cls.ages)), cls.ages):
+            Profile.objects.filter(user=user).update(date_of_birth=ProfilerQuerySet.years_before(localdate(), age))
+
+    def test_age_range_is_inclusive(self):
+        self.assertEqual(Profile.objects.age_range(18, 29).count(), 2)
+        self.assertEqual(Profile.objects.age_range(30, 30).count(), 2)
+        self.assertEqual(Profile.objects.age_range(0, 100).count(), len(self.ages))
+
+    def test_admin_filter_buckets_count_every_profile_once(self):
+        ranges = [ages for ages, label in AgeProfileListFilter.age_ranges]
+        buckets = Profile.objects.age_buckets(ranges)
+        self.assertEqual(buckets, {'0,17': 2, '18,29': 2, '30,39': 3, '40,49': 1, '50,59': 0, '60,69': 0, '70,79': 0})
+        for (start, end), count in zip(ranges, buckets.values()):
+            self.assertEqual(Profile.objects.age_range(start, end).count(), count)
+
+
+def create_cache_table(table):
+    with override_settings(CACHES={'default': {'BACKEND': 'core.cache.DatabaseCache', 'LOCATION': table}}):
+        call_command('createcachetable', verbosity=0)
+
+
+class FileBasedCacheTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache = FileBasedCache(directory.name, {})
+
+    def get_expiry(self, key):
+        with open(self.cache._key_to_file(key), 'rb') as file:
+            return pickle.load(file)
+
+    def test_add(self):
+        self.assertTrue(self.cache.add('key', 1, 60))
+        self.assertFalse(self.cache.add('key', 2, 60))
+        self.assertEqual(self.cache.get('key'), 1)
+
+    def test_add_replaces_an_expired_key(self):
+        self.cache.set('key', 1, -1)
+        self.assertTrue(self.cache.add('key', 2, 60))
+        self.assertEqual(self.cache.get('key'), 2)
+
+    def test_incr_keeps_the_expiry(self):
+        self.cache.add('key', 1, 60)
+        expiry = self.get_expiry('key')
+        self.assertEqual(self.cache.incr('key'), 2)
+        self.assertEqual(self.cache.incr('key', 3), 5)
+        self.assertEqual(self.get_expiry('key'), expiry)
+        self.assertEqual(self.cache.get('key'), 5)
+
+    def test_incr_missing_or_expired_key(self):
+        with self.assertRaises(ValueError):
+            self.cache.incr('key')
+        self.cache.set('key', 1, -1)
+        with self.assertRaises(ValueError):
+            self.cache.incr('key')
+
+    def test_concurrent_adds_and_increments(self):
+        added = []
+
+        def add_and_incr():
+            if self.cache.add('key', 0, 60):
+                added.append(True)
+            for _ in range(20):
+                self.cache.incr('key')
+
+        threads = [threading.Thread(target=add_and_incr) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(added, [True])
+        self.assertEqual(self.cache.get('key'), 8 * 20)
+
+
+class DatabaseCacheTests(TestCase):
+    table = 'test_finder_cache'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        create_cache_table(cls.table)
+
+    def setUp(self):
+        self.cache = DatabaseCache(self.table, {})
+
+    def get_expiry(self, key):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT expires FROM {self.table} WHERE cache_key = %s', [self.cache.make_key(key)])
+            return cursor.fetchone()[0]
+
+    def test_incr_keeps_the_expiry(self):
+        self.cache.add('key', 1, 60)
+        expiry = self.get_expiry('key')
+        self.assertEqual(self.cache.incr('key'), 2)
+        self.assertEqual(self.cache.incr('key', 3), 5)
+        self.assertEqual(self.get_expiry('key'), expiry)
+        self.assertEqual(self.cache.get('key'), 5)
+
+    def test_incr_missing_or_expired_key(self):
+        with self.assertRaises(ValueError):
+            self.cache.incr('key')
+        self.cache.set('key', 1, -1)
+        with self.assertRaises(ValueError):
+            self.cache.incr('key')
+
+
+class FixedWindowRateThrottleTests(TestCase):
+    table = 'test_finder_throttle_cache'
+
+    class Throttle(FixedWindowRateThrottle):
+        rate = '3/minute'
+
+        def get_cache_key(self, request, view):
+            return 'throttle:test'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        create_cache_table(cls.table)
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.caches = {
+            'locmem': LocMemCache('throttle', {}),
+            'file': FileBasedCache(directory.name, {}),
+            'database': DatabaseCache(self.table, {}),
+        }
+        # The local memory caches of a name share their entries
+        self.caches['locmem'].clear()
+        self.start = 60 * 1000 + 15
+
+    def get_throttle(self, cache, timer):
+        throttle = self.Throttle()
+        throttle.cache = cache
+        throttle.timer = lambda: timer
+        return throttle
+
+    def allow_requests(self, cache, count, timer):
+        return [self.get_throttle(cache, timer).allow_request(None, None) for _ in range(count)]
+
+    def test_requests_beyond_the_rate_are_denied_until_the_next_window(self):
+        for name, cache in self.caches.items():
+            with self.subTest(cache=name):
+                self.assertEqual(self.allow_requests(cache, 4, self.start), [True, True, True, False])
+                throttle = self.get_throttle(cache, self.start + 5)
+                self.assertFalse(throttle.allow_request(None, None))
+                self.assertEqual(throttle.wait(), 40)
+                self.assertEqual(self.allow_requests(cache, 4, self.start + 45), [True, True, True, False])
+
+    def test_counter_expires_with_the_window(self):
+        cache = self.caches['locmem']
+        before = time.time()
+        self.allow_requests(cache, 1, self.start)
+        expiry = cache._expire_info[cache.make_key(f'throttle:test:{self.start // 60}')]
+        self.assertAlmostEqual(expiry - before, 45, delta=1)
@@ -9,6 +9,8 @@ from django.contrib.contenttypes.models import ContentType
 from djoser.conf import settings
 from djoser.compat import get_user_email
 
+from core.images import get_variant_url
+
 from .enums import SocialLinkIconChoice
 
 
@@ -28,9 +30,11 @@ def get_object_or_none(model, *args, **kwargs):
         return None
 
 
-def create_profile_html(image):
+def create_profile_html(image, variants=None):
+    # Preview a variant close to the displayed size, and keep the link to the original
+    src = get_variant_url(image, variants, 400) or image.url
     return mark_safe(
-        f"""<a href='{image.url}'><img src="{image.url}" style="height:400px; width: 400px; border-radius: 50%; border: 
+        f"""<a href='{image.url}'><img src="{src}" style="height:400px; width: 400px; border-radius: 50%; border: 
         6px solid gray;"></a>""")
 
 
@@ -56,6 +60,8 @@ def send_confirmation_mail(request, user):
 def get_hostname_from_url(url):
     # Get hostname from url
     hostname = urlparse(url).hostname
+    if not hostname:
+        return ''
 
     # Remove the www. prefix, if present.
     if hostname.startswith("www."):
@@ -64,9 +70,16 @@ def get_hostname_from_url(url):
     return hostname
 
 
+SOCIAL_LINK_ICONS = {
+    hostname: icon for hostname, icon in SocialLinkIconChoice.choices if hostname != SocialLinkIconChoice.OTHER
+}
+
+
 def get_icon_from_hostname(hostname):
-    choices = SocialLinkIconChoice.choices
-    for key, val in choices:
-        if key == hostname:
-            return val
-    return SocialLinkIconChoice.OTHER
+    # Walk up the parent domains, so subdomains like m.facebook.com get the icon of facebook.com
+    while hostname:
+        icon = SOCIAL_LINK_ICONS.get(hostname)
+        if icon is not None:
+            return icon
+        hostname = hostname.partition('.')[2]
+    return SocialLinkIconChoice.OTHER.value
@@ -0,0 +1,21 @@
+from accounts.enums import SocialLinkIconChoice
+
+
+# Seeded users are recognized by their email domain
+EMAIL_DOMAIN = 'benchmark.finder.test'
+PASSWORD = 'benchmark-password'
+# Users of the load tests, deleted at the start of every run
+LOAD_TEST_EMAIL_DOMAIN = 'load.finder.test'
+
+FIRST_NAMES = ['Ahmed', 'Mohamed', 'Sara', 'Mona', 'Omar', 'Nour', 'Youssef', 'Hana', 'Ali', 'Laila', 'Karim', 'Salma']
+LAST_NAMES = ['Hassan', 'Mostafa', 'Ibrahim', 'Adel', 'Fathy', 'Saeed', 'Kamal', 'Nabil', 'Sami', 'Farouk']
+LINK_HOSTS = [hostname for hostname, _ in SocialLinkIconChoice.choices if hostname != SocialLinkIconChoice.OTHER]
+LINK_HOSTS.append('example.com')
+
+
+def get_email(index: int) -> str:
+    return f'user{index}@{EMAIL_DOMAIN}'
+
+
+def get_load_test_email(index: int, social: bool = False) -> str:
+    return f'{"social" if social else "user"}{index}@{LOAD_TEST_EMAIL_DOMAIN}'
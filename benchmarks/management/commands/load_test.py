@@ -0,0 +1,286 @@
+import os
+import re
+import sys
+import json
+import random
+import socket
+import threading
+import subprocess
+import importlib.util
+from time import perf_counter, sleep
+from collections import Counter, defaultdict
+from urllib.parse import urlsplit, parse_qsl, urlencode
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.checks import LOCAL_CACHE_BACKENDS
+from accounts.models import User, Profile, OutboxEmail
+from benchmarks.utils import summarize_durations
+from benchmarks.data import PASSWORD, LOAD_TEST_EMAIL_DOMAIN, get_load_test_email
+from benchmarks.stubs import SMTPSink, StubOAuthProvider, serve_in_thread
+
+
+ACTIVATION_URL_REGEX = re.compile(r'activation/(?P<uid>[\w-]+)/(?P<token>[\w-]+)')
+
+
+class FlowError(Exception):
+    """A stage of a user flow failed, the rest of the flow is skipped"""
+
+
+def get_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class StageRecorder:
+    """Durations & failures of every stage, across the concurrent user flows"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.durations = defaultdict(list)
+        self.windows = {}
+        self.errors = defaultdict(Counter)
+
+    def record(self, stage: str, start: float, end: float, error: str = None):
+        with self._lock:
+            if error is not None:
+                self.errors[stage][error] += 1
+                return
+            self.durations[stage].append(end - start)
+            first_start, last_end = self.windows.get(stage, (start, end))
+            self.windows[stage] = (min(first_start, start), max(last_end, end))
+
+    def summarize(self) -> dict:
+        results = {}
+        for stage in dict.fromkeys([*self.durations, *self.errors]):
+            durations = self.durations[stage]
+            first_start, last_end = self.windows.get(stage, (0, 0))
+            results[stage] = {
+                'count': len(durations),
+                'errors': dict(self.errors[stage]),
+                # Stages overlap between the flows, the throughput is measured over the time the stage was running
+                'throughput': round(len(durations) / (last_end - first_start), 2) if last_end > first_start else 0,
+                'latency_ms': summarize_durations(durations),
+            }
+        return results
+
+
+class Command(BaseCommand):
+    help = ('Run concurrent signup -> activation -> login -> profile update -> visit flows, and social logins, '
+            'or anonymous read flows of the profile, QR scan & info endpoints, against a server process with a local '
+            'SMTP sink & OAuth provider, and report every stage as JSON')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--flow', choices=['signup', 'read'], default='signup',
+                            help='Sign users up and in, or read profiles, scan QR codes and read the info pages')
+        parser.add_argument('--users', type=int, default=50, help='Number of user flows to run')
+        parser.add_argument('--concurrency', type=int, default=10, help='Number of flows running at the same time')
+        parser.add_argument('--reads', type=int, default=10, help='Number of read rounds of every read flow')
+        parser.add_argument('--social-ratio', type=float, default=0.2,
+                            help='Share of the users that sign in through the social provider instead of signing up')
+        parser.add_argument('--server', choices=['runserver', 'uvicorn'], default='runserver',
+                            help='Run the WSGI development server, or the ASGI application under uvicorn')
+        parser.add_argument('--server-workers', type=int, default=1, help='Number of uvicorn worker processes')
+        parser.add_argument('--async-views', action='store_true',
+                            help='Serve the profile, QR scan & info endpoints with the async views, see `ASYNC_VIEWS`')
+        parser.add_argument('--server-log', default=os.devnull, help='File to write the server & mail worker logs to')
+        parser.add_argument('--email-timeout', type=float, default=30, help='Seconds to wait for an activation email')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the social users & visited profiles')
+        parser.add_argument('--output', help='File to write the results to, instead of the standard output')
+
+    def handle(self, *args, **options):
+        # The visited profiles must exist before the flows start, the seeded benchmark data is enough
+        self.targets = list(
+            Profile.objects.active().filter(is_public=True).exclude(user__email__endswith=f'@{LOAD_TEST_EMAIL_DOMAIN}')
+            .order_by('id').values_list('id', 'qr_code')[:1000]
+        )
+        if not self.targets:
+            raise CommandError('There are no public profiles to visit, run `seed_benchmark_data` first')
+        if options['server'] == 'uvicorn' and importlib.util.find_spec('uvicorn') is None:
+            raise CommandError('Running the ASGI server requires the `uvicorn` package')
+        if options['server_workers'] > 1 and settings.CACHES['default']['BACKEND'] in LOCAL_CACHE_BACKENDS:
+            raise CommandError('Running several server workers requires a shared cache, set `CACHE_URL`')
+        # The emails left unsent would be delivered to the users of this run
+        deleted, _ = OutboxEmail.objects.filter(to__icontains=f'@{LOAD_TEST_EMAIL_DOMAIN}').delete()
+        deleted += User.objects.filter(email__endswith=f'@{LOAD_TEST_EMAIL_DOMAIN}').delete()[0]
+        if deleted:
+            self.stderr.write(f'Deleted {deleted} rows of the previous load test')
+
+        self.options = options
+        self.sink = serve_in_thread(SMTPSink())
+        self.provider = serve_in_thread(StubOAuthProvider())
+        self.recorder = StageRecorder()
+        port = get_free_port()
+        self.base_url = f'http://127.0.0.1:{port}'
+
+        processes = {}
+        try:
+            with open(options['server_log'], 'a') as log:
+                processes['server'] = self.start_server(port, log)
+                processes['mail_worker'] = self.mail_worker = self.start_process(
+                    ['send_queued_mail', '--interval', '0.05'], log
+                )
+                self.wait_for_server(processes['server'])
+
+                start = perf_counter()
+                run_flow = self.run_read_flow if options['flow'] == 'read' else self.run_flow
+                with ThreadPoolExecutor(options['concurrency']) as executor:
+                    list(executor.map(run_flow, range(options['users'])))
+                duration = perf_counter() - start
+                exited = {name: process.returncode for name, process in processes.items() if process.poll() is not None}
+        finally:
+            for process in processes.values():
+                process.terminate()
+            for process in processes.values():
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+            self.sink.shutdown()
+            self.provider.shutdown()
+
+        report = {
+            'server': options['server'],
+            'flow': options['flow'],
+            'users': options['users'],
+            'concurrency': options['concurrency'],
+            'duration': round(duration, 3),
+            'stages': self.recorder.summarize(),
+            # Processes that crashed during the run, their logs are in --server-log
+            'exited_processes': exited,
+        }
+        for name, code in exited.items():
+            self.stderr.write(f'The {name} process exited with the code {code} during the run')
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+    def get_environment(self) -> dict:
+        return {
+            **os.environ,
+            'DJANGO_SETTINGS_MODULE': 'benchmarks.settings',
+            'WEB_CONCURRENCY': str(self.options['server_workers']),
+            'ASYNC_VIEWS': str(self.options['async_views']),
+            'LOAD_TEST_SMTP_PORT': str(self.sink.server_address[1]),
+            'LOAD_TEST_OAUTH_URL': self.provider.url,
+        }
+
+    def start_process(self, command: list, log):
+        return subprocess.Popen([sys.executable, str(settings.BASE_DIR / 'manage.py'), *command],
+                                env=self.get_environment(), cwd=settings.BASE_DIR, stdout=log, stderr=log)
+
+    def start_server(self, port: int, log):
+        if self.options['server'] == 'runserver':
+            return self.start_process(['runserver', f'127.0.0.1:{port}', '--noreload'], log)
+        return subprocess.Popen(
+            [sys.executable, '-m', 'uvicorn', 'core.asgi:application', '--host', '127.0.0.1', '--port', str(port),
+             '--workers', str(self.options['server_workers']), '--no-access-log'],
+            env=self.get_environment(), cwd=settings.BASE_DIR, stdout=log, stderr=log
+        )
+
+    def wait_for_server(self, process, timeout: float = 60):
+        deadline = perf_counter() + timeout
+        while perf_counter() < deadline:
+            if process.poll() is not None:
+                raise CommandError(f'The server exited with the code {process.returncode}, see --server-log')
+            try:
+                requests.get(f'{self.base_url}/api/main-info/', timeout=5)
+                return
+            except requests.ConnectionError:
+                sleep(0.2)
+        raise CommandError(f'The server did not start in {timeout} seconds')
+
+    def request(self, stage: str, session, method: str, path: str, expected_status: int, **kwargs):
+        url = path if path.startswith('http') else f'{self.base_url}{path}'
+        start = perf_counter()
+        try:
+            response = session.request(method, url, timeout=60, **kwargs)
+        except requests.RequestException as error:
+            self.recorder.record(stage, start, perf_counter(), type(error).__name__)
+            raise FlowError(stage)
+        end = perf_counter()
+        if response.status_code != expected_status:
+            self.recorder.record(stage, start, end, str(response.status_code))
+            raise FlowError(stage)
+        self.recorder.record(stage, start, end)
+        return response
+
+    def run_flow(self, index: int):
+        rng = random.Random(f'{self.options["seed"]}-{index}')
+        session = requests.Session()
+        try:
+            if rng.random() < self.options['social_ratio']:
+                access = self.social_login(session, get_load_test_email(index, social=True))
+            else:
+                access = self.sign_up(session, index)
+            session.headers['Authorization'] = f'JWT {access}'
+            self.request('profile_update', session, 'PATCH', '/api/profile/me/', 200,
+                         json={'bio': f'Load test user {index}'})
+            profile_id, _ = rng.choice(self.targets)
+            self.request('visit', session, 'POST', '/api/visit/', 201, json={'profile': profile_id})
+        except FlowError:
+            pass
+        finally:
+            session.close()
+
+    def run_read_flow(self, index: int):
+        """Anonymous visitor of the busiest read endpoints, the scans record visits as well"""
+        rng = random.Random(f'{self.options["seed"]}-{index}')
+        session = requests.Session()
+        try:
+            for _ in range(self.options['reads']):
+                profile_id, qr_code = rng.choice(self.targets)
+                self.request('profile_retrieve', session, 'GET', f'/api/profile/{profile_id}/', 200)
+                self.request('qr_scan', session, 'GET', f'/api/profile/by-qr/{qr_code}/', 200)
+                self.request('info', session, 'GET', '/api/main-info/', 200)
+        except FlowError:
+            pass
+        finally:
+            session.close()
+
+    def sign_up(self, session, index: int) -> str:
+        email = get_load_test_email(index)
+        signup_start = perf_counter()
+        self.request('signup', session, 'POST', '/api/auth/users/', 201, json={
+            'email': email, 'username': f'load_user{index}', 'first_name': 'Load', 'last_name': f'User{index}',
+            'password': PASSWORD,
+        })
+
+        # Queued by the signup & sent by the outbox worker, the delay is the time from the signup request to the sink
+        received, deadline = None, perf_counter() + self.options['email_timeout']
+        while received is None and perf_counter() < deadline and self.mail_worker.poll() is None:
+            received = self.sink.wait_for_message(email, 1)
+        if received is None:
+            error = 'timeout' if self.mail_worker.poll() is None else 'mail_worker_exited'
+            self.recorder.record('activation_email', signup_start, perf_counter(), error)
+            raise FlowError('activation_email')
+        received_at, message = received
+        match = ACTIVATION_URL_REGEX.search(message.get_body(('plain', 'html')).get_content())
+        self.recorder.record('activation_email', signup_start, received_at, None if match else 'no_activation_url')
+        if match is None:
+            raise FlowError('activation_email')
+
+        self.request('activation', session, 'POST', '/api/auth/users/activation/', 204, json=match.groupdict())
+        response = self.request('login', session, 'POST', '/api/auth/jwt/create/', 200,
+                                json={'email': email, 'password': PASSWORD})
+        return response.json()['access']
+
+    def social_login(self, session, email: str) -> str:
+        """Authorization code flow, the session cookie keeps the state between the two requests of the server"""
+        start = perf_counter()
+        response = self.request('social_login_url', session, 'GET', '/api/auth/social/stub-oauth2/', 200,
+                                params={'redirect_uri': '/stub'})
+        authorization_url = f'{response.json()["authorization_url"]}&{urlencode({"login_hint": email})}'
+        response = session.get(authorization_url, allow_redirects=False, timeout=60)
+        params = dict(parse_qsl(urlsplit(response.headers['Location']).query))
+        response = self.request('social_login_complete', session, 'POST', '/api/auth/social/stub-oauth2/', 201,
+                                params={'code': params['code'], 'state': params['state']})
+        self.recorder.record('social_login', start, perf_counter())
+        return response.json()['access']
@@ -0,0 +1,118 @@
+import json
+from time import perf_counter
+from collections import Counter
+
+from django.db import connection
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.models import User
+from benchmarks.data import get_email
+from benchmarks.utils import summarize_durations
+from benchmarks.scenarios import ScenarioContext, get_scenarios
+
+
+class Command(BaseCommand):
+    help = ('Request the main API endpoints in-process against the seeded data, and report their throughput, latency '
+            'percentiles & query counts as JSON')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Number of measured requests per scenario')
+        parser.add_argument('--warmup', type=int, default=20, help='Number of requests to send before measuring')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the picked profiles & search terms')
+        parser.add_argument('--scenarios', nargs='*', help='Names of the scenarios to run, all of them by default')
+        parser.add_argument('--output', help='File to write the results to, instead of the standard output')
+        parser.add_argument('--baseline', help='Results of a previous run to compare against')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Allowed relative increase of the p95 latency over the baseline')
+        parser.add_argument('--fail-on-regression', action='store_true',
+                            help='Exit with an error when a scenario regressed compared to the baseline')
+
+    def handle(self, *args, **options):
+        try:
+            scenarios = get_scenarios(options['scenarios'])
+        except ValueError as e:
+            raise CommandError(e)
+        user = User.objects.filter(email=get_email(0)).first()
+        if user is None:
+            raise CommandError('No benchmark data was found, run `seed_benchmark_data` first')
+        context = ScenarioContext(user, options['seed'])
+        if not context:
+            raise CommandError('The benchmark data has no public profiles')
+
+        # The test environment allows the test client's host, and uses the in-memory email backend
+        setup_test_environment()
+        try:
+            results = {scenario.name: self.run_scenario(scenario, user, context, options) for scenario in scenarios}
+        finally:
+            teardown_test_environment()
+
+        report = {'requests': options['requests'], 'seed': options['seed'], 'scenarios': results}
+        regressions = []
+        if options['baseline']:
+            with open(options['baseline']) as file:
+                baseline = json.load(file)
+            regressions = self.compare(results, baseline['scenarios'], options['tolerance'])
+            report['regressions'] = regressions
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+        for regression in regressions:
+            self.stderr.write(regression)
+        if regressions and options['fail_on_regression']:
+            raise CommandError(f'{len(regressions)} regressions were found')
+
+    def run_scenario(self, scenario, user, context: ScenarioContext, options: dict) -> dict:
+        client = APIClient()
+        if scenario.authenticated:
+            client.credentials(HTTP_AUTHORIZATION=f'JWT {AccessToken.for_user(user)}')
+
+        for _ in range(options['warmup']):
+            method, path, data = scenario.get_request(context.next())
+            getattr(client, method)(path, data)
+
+        durations, queries, statuses = [], [], Counter()
+        for _ in range(options['requests']):
+            method, path, data = scenario.get_request(context.next())
+            with CaptureQueriesContext(connection) as captured:
+                start = perf_counter()
+                response = getattr(client, method)(path, data)
+                durations.append(perf_counter() - start)
+            queries.append(len(captured.captured_queries))
+            statuses[str(response.status_code)] += 1
+
+        return {
+            'throughput': round(len(durations) / sum(durations), 2),
+            'latency_ms': summarize_durations(durations),
+            'queries': {
+                'min': min(queries),
+                'mean': round(sum(queries) / len(queries), 2),
+                'max': max(queries),
+            },
+            'statuses': dict(statuses),
+        }
+
+    def compare(self, results: dict, baseline: dict, tolerance: float) -> list:
+        """
+        Latency depends on the machine, only a p95 increase beyond the tolerance is a regression.
+        Query counts don't, any increase is.
+        """
+        regressions = []
+        for name, result in results.items():
+            if name not in baseline:
+                continue
+            old_p95, new_p95 = baseline[name]['latency_ms']['p95'], result['latency_ms']['p95']
+            if new_p95 > old_p95 * (1 + tolerance):
+                regressions.append(f'{name}: p95 latency went from {old_p95}ms to {new_p95}ms')
+            old_queries, new_queries = baseline[name]['queries']['mean'], result['queries']['mean']
+            if new_queries > old_queries:
+                regressions.append(f'{name}: mean query count went from {old_queries} to {new_queries}')
+        return regressions
@@ -0,0 +1,82 @@
+import random
+from datetime import date, timedelta
+
+from django.db import transaction
+from django.utils.timezone import now
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.enums import GenderChoice
+from accounts.qr_code import qr_code_allocator
+from accounts.utils import get_icon_from_hostname
+from accounts.models import User, Profile, SocialLink, VisitLog
+from benchmarks.data import EMAIL_DOMAIN, PASSWORD, FIRST_NAMES, LAST_NAMES, LINK_HOSTS, get_email
+
+
+class Command(BaseCommand):
+    help = 'Seed users, profiles, social links and visit logs for the benchmarks, the same seed gives the same data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help='Number of users, each one with a profile')
+        parser.add_argument('--links', type=int, default=3, help='Number of social links per profile')
+        parser.add_argument('--visits', type=int, default=10, help='Number of visits made by each user')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the random data')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Number of rows to insert at a time')
+        parser.add_argument('--clear', action='store_true', help='Delete the previously seeded data first')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        batch_size, users_count = options['batch_size'], options['users']
+        seeded_users = User.objects.filter(email__endswith=f'@{EMAIL_DOMAIN}')
+
+        if options['clear']:
+            deleted, _ = seeded_users.delete()
+            self.stdout.write(f'Deleted {deleted} seeded rows')
+        elif seeded_users.exists():
+            raise CommandError('Benchmark data has been seeded already, use --clear to seed it again')
+
+        with transaction.atomic():
+            # Hashing is slow on purpose, all users share the same password
+            password = make_password(PASSWORD)
+            User.objects.bulk_create([
+                User(email=get_email(i), username=f'benchmark_user{i}', password=password,
+                     first_name=f'{rng.choice(FIRST_NAMES)}', last_name=f'{rng.choice(LAST_NAMES)}{i}')
+                for i in range(users_count)
+            ], batch_size=batch_size)
+            users = list(seeded_users.order_by('id'))
+
+            # bulk_create skips the signals that give the profiles their codes
+            first_qr_code, _ = qr_code_allocator.reserve_block(users_count)
+            Profile.objects.bulk_create([
+                Profile(user=user, qr_code=first_qr_code + i, is_public=rng.random() > 0.1,
+                        bio=f'Benchmark profile of {user.first_name}', gender=rng.choice(GenderChoice.values),
+                        date_of_birth=date(1960, 1, 1) + timedelta(days=rng.randint(0, 365 * 45)))
+                for i, user in enumerate(users)
+            ], batch_size=batch_size)
+            profile_ids = list(
+                Profile.objects.filter(user__in=seeded_users).order_by('id').values_list('id', flat=True)
+            )
+
+            links = []
+            for profile_id, user in zip(profile_ids, users):
+                for host in rng.sample(LINK_HOSTS, min(options['links'], len(LINK_HOSTS))):
+                    links.append(SocialLink(profile_id=profile_id, url=f'https://{host}/{user.username}', domain=host,
+                                            icon=get_icon_from_hostname(host), is_active=rng.random() > 0.2))
+            SocialLink.objects.bulk_create(links, batch_size=batch_size)
+
+            current_time = now()
+            visits = [
+                VisitLog(visitor=user, profile_id=rng.choice(profile_ids), is_scanned=rng.random() > 0.5,
+                         create_at=current_time - timedelta(seconds=rng.randint(0, 60 * 60 * 24 * 30)))
+                for user in users for _ in range(options['visits'])
+            ]
+            VisitLog.objects.bulk_create(visits, batch_size=batch_size)
+
+        # The search tokens & daily stats are kept by signals, that bulk_create doesn't send
+        call_command('rebuild_search_index', batch_size=batch_size, stdout=self.stdout)
+        call_command('backfill_visit_stats', batch_size=batch_size, stdout=self.stdout)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully seeded {len(users)} users, {len(links)} social links and {len(visits)} visit logs'
+        ))
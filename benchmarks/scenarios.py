@@ -0,0 +1,68 @@
+import random
+
+from accounts.models import Profile
+from benchmarks.data import EMAIL_DOMAIN, FIRST_NAMES
+
+
+class Scenario:
+    """
+    A request to benchmark, `path` & `data` are formatted with the values picked by `get_context` for each request,
+    e.g. a random public profile, so that the requests don't all hit the same rows.
+    """
+
+    def __init__(self, name: str, path: str, method: str = 'get', data: dict = None, authenticated: bool = False):
+        self.name = name
+        self.path = path
+        self.method = method
+        self.data = data
+        self.authenticated = authenticated
+
+    def get_request(self, context: dict):
+        data = {key: value.format(**context) for key, value in self.data.items()} if self.data else None
+        return self.method, self.path.format(**context), data
+
+
+SCENARIOS = [
+    Scenario('profile-list', '/api/profile/'),
+    Scenario('profile-list-expanded', '/api/profile/?expand=links,user'),
+    Scenario('profile-retrieve', '/api/profile/{profile}/'),
+    Scenario('profile-me', '/api/profile/me/', authenticated=True),
+    Scenario('profile-by-qr', '/api/profile/by-qr/{qr_code}/', authenticated=True),
+    Scenario('visit-create', '/api/visit/', method='post', data={'profile': '{profile}'}, authenticated=True),
+    Scenario('visit-my-views', '/api/visit/my-views/', authenticated=True),
+    Scenario('visit-my-visits', '/api/visit/my-visits/', authenticated=True),
+    Scenario('user-search', '/api/auth/users/?search={name}', authenticated=True),
+    Scenario('info-main-info', '/api/main-info/'),
+    Scenario('info-faqs', '/api/frequently-asked-question/'),
+    Scenario('info-about-us', '/api/about-us/'),
+    Scenario('info-terms-of-service', '/api/terms-of-service/'),
+    Scenario('info-cookie-policy', '/api/cookie-policy/'),
+    Scenario('info-privacy-policy', '/api/privacy-policy/'),
+    Scenario('info-header-image', '/api/header-image/'),
+]
+
+
+class ScenarioContext:
+    """Pick the values of the scenarios among the seeded public profiles, other than the one of the requesting user"""
+
+    def __init__(self, user, seed: int = 0):
+        self.rng = random.Random(seed)
+        profiles = Profile.objects.active().filter(is_public=True, user__email__endswith=f'@{EMAIL_DOMAIN}')
+        self.profiles = list(profiles.exclude(user=user).order_by('id').values_list('id', 'qr_code'))
+
+    def __bool__(self):
+        return bool(self.profiles)
+
+    def next(self) -> dict:
+        profile, qr_code = self.rng.choice(self.profiles)
+        return {'profile': profile, 'qr_code': qr_code, 'name': self.rng.choice(FIRST_NAMES)}
+
+
+def get_scenarios(names=None) -> list:
+    if not names:
+        return SCENARIOS
+    scenarios = [scenario for scenario in SCENARIOS if scenario.name in names]
+    unknown = set(names) - {scenario.name for scenario in scenarios}
+    if unknown:
+        raise ValueError(f'Unknown scenarios: {", ".join(sorted(unknown))}')
+    return scenarios
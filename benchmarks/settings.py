@@ -0,0 +1,25 @@
+"""
+Settings of the server under load test, see the `load_test` command.
+The external services are replaced by the local SMTP sink & OAuth provider that the command starts.
+"""
+from core.settings import *  # noqa: F401,F403
+from core.settings import env, ALLOWED_HOSTS, INSTALLED_APPS, AUTHENTICATION_BACKENDS, DJOSER
+
+
+if 'benchmarks' not in INSTALLED_APPS:
+    INSTALLED_APPS = [*INSTALLED_APPS, 'benchmarks']
+ALLOWED_HOSTS = [*ALLOWED_HOSTS, '127.0.0.1', 'localhost']
+
+# Emails are still queued in the outbox, the `send_queued_mail` worker sends them to the sink
+OUTBOX_EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+EMAIL_HOST = '127.0.0.1'
+EMAIL_PORT = env.int('LOAD_TEST_SMTP_PORT', default=2525)
+EMAIL_HOST_USER = ''
+EMAIL_HOST_PASSWORD = ''
+EMAIL_USE_TLS = False
+
+AUTHENTICATION_BACKENDS = ('benchmarks.social.StubOAuth2', *AUTHENTICATION_BACKENDS)
+SOCIAL_AUTH_STUB_OAUTH2_URL = env('LOAD_TEST_OAUTH_URL', default='http://127.0.0.1:8901/')
+SOCIAL_AUTH_STUB_OAUTH2_KEY = 'load-test'
+SOCIAL_AUTH_STUB_OAUTH2_SECRET = 'load-test'
+DJOSER = {**DJOSER, 'SOCIAL_AUTH_ALLOWED_REDIRECT_URIS': [*DJOSER['SOCIAL_AUTH_ALLOWED_REDIRECT_URIS'], '/stub']}
@@ -0,0 +1,31 @@
+from urllib.parse import urljoin
+
+from social_core.backends.oauth import BaseOAuth2
+
+
+class StubOAuth2(BaseOAuth2):
+    """Social auth backend of the local provider of the load tests, `benchmarks.stubs.StubOAuthProvider`"""
+    name = 'stub-oauth2'
+    ACCESS_TOKEN_METHOD = 'POST'
+    EXTRA_DATA = [('expires_in', 'expires')]
+
+    def authorization_url(self):
+        return urljoin(self.setting('URL'), 'authorize')
+
+    def access_token_url(self):
+        return urljoin(self.setting('URL'), 'token')
+
+    def get_user_id(self, details, response):
+        return response['email']
+
+    def get_user_details(self, response):
+        return {
+            'username': response['email'].split('@')[0],
+            'email': response['email'],
+            'first_name': response['first_name'],
+            'last_name': response['last_name'],
+        }
+
+    def user_data(self, access_token, *args, **kwargs):
+        return self.get_json(urljoin(self.setting('URL'), 'userinfo'),
+                             headers={'Authorization': f'Bearer {access_token}'})
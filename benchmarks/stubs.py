@@ -0,0 +1,150 @@
+import json
+import secrets
+import threading
+import socketserver
+from time import perf_counter
+from email import message_from_bytes, policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    """Just enough of SMTP for `smtplib`, without TLS nor authentication"""
+
+    def reply(self, line: str):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        recipients = []
+        self.reply('220 localhost SMTP sink')
+        for line in self.rfile:
+            command = line.decode(errors='replace').strip()
+            verb = command[:4].upper()
+            if verb in ('HELO', 'EHLO'):
+                self.reply('250 localhost')
+            elif verb == 'MAIL':
+                recipients = []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                recipients.append(command.partition(':')[2].strip().split()[0].strip('<>').lower())
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                lines = []
+                for data_line in self.rfile:
+                    if data_line in (b'.\r\n', b'.\n'):
+                        break
+                    # Lines starting with a dot have been escaped with another one
+                    lines.append(data_line[1:] if data_line.startswith(b'..') else data_line)
+                self.server.deliver(recipients, b''.join(lines))
+                recipients = []
+                self.reply('250 OK')
+            elif verb in ('RSET', 'NOOP'):
+                recipients = [] if verb == 'RSET' else recipients
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    """Local SMTP server that keeps the received messages in memory, by recipient"""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address=('127.0.0.1', 0)):
+        super().__init__(address, SMTPSinkHandler)
+        self.condition = threading.Condition()
+        self.messages = {}
+
+    def deliver(self, recipients: list, data: bytes):
+        message = message_from_bytes(data, policy=policy.default)
+        with self.condition:
+            for recipient in recipients:
+                self.messages.setdefault(recipient, []).append((perf_counter(), message))
+            self.condition.notify_all()
+
+    def wait_for_message(self, recipient: str, timeout: float):
+        """Pop the first message sent to the recipient, return `(received time, message)` or None on timeout"""
+        recipient = recipient.lower()
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.messages.get(recipient), timeout):
+                return None
+            return self.messages[recipient].pop(0)
+
+
+class StubOAuthHandler(BaseHTTPRequestHandler):
+    """
+    OAuth2 authorization code flow, the user is the `login_hint` of the authorization request, there is no consent
+    page, `/authorize` redirects to the client with a code straight away.
+    """
+
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, data: dict, status: int = 200):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = dict(parse_qsl(url.query))
+        if url.path == '/authorize':
+            code = self.server.issue('codes', params.get('login_hint', ''))
+            redirect = urlsplit(params['redirect_uri'])
+            query = urlencode([*parse_qsl(redirect.query), ('code', code), ('state', params.get('state', ''))])
+            self.send_response(302)
+            self.send_header('Location', urlunsplit(redirect._replace(query=query)))
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+        elif url.path == '/userinfo':
+            token = self.headers.get('Authorization', '').removeprefix('Bearer ')
+            email = self.server.tokens.get(token)
+            if email is None:
+                return self.send_json({'error': 'invalid_token'}, 401)
+            first_name, _, last_name = email.partition('@')[0].partition('.')
+            self.send_json({'email': email, 'first_name': first_name, 'last_name': last_name or first_name})
+        else:
+            self.send_json({'error': 'not_found'}, 404)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        params = dict(parse_qsl(self.rfile.read(length).decode()))
+        if urlsplit(self.path).path != '/token':
+            return self.send_json({'error': 'not_found'}, 404)
+        email = self.server.codes.pop(params.get('code'), None)
+        if email is None:
+            return self.send_json({'error': 'invalid_grant'}, 400)
+        self.send_json({'access_token': self.server.issue('tokens', email), 'token_type': 'bearer',
+                        'expires_in': 3600})
+
+
+class StubOAuthProvider(ThreadingHTTPServer):
+    """Local OAuth2 provider, used by `benchmarks.social.StubOAuth2` in place of Google & Facebook"""
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 0)):
+        super().__init__(address, StubOAuthHandler)
+        self.codes = {}
+        self.tokens = {}
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/'
+
+    def issue(self, kind: str, email: str) -> str:
+        value = secrets.token_urlsafe(24)
+        getattr(self, kind)[value] = email
+        return value
+
+
+def serve_in_thread(server):
+    threading.Thread(target=server.serve_forever, name=type(server).__name__, daemon=True).start()
+    return server
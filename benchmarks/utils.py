@@ -0,0 +1,19 @@
+import math
+
+
+def percentile(values: list, percent: float) -> float:
+    """Nearest-rank percentile of sorted values"""
+    return values[max(math.ceil(len(values) * percent / 100) - 1, 0)]
+
+
+def summarize_durations(durations: list) -> dict:
+    """Mean & percentiles of durations in seconds, in milliseconds"""
+    if not durations:
+        return {}
+    durations = sorted(durations)
+    return {
+        'mean': round(sum(durations) / len(durations) * 1000, 3),
+        'p50': round(percentile(durations, 50) * 1000, 3),
+        'p95': round(percentile(durations, 95) * 1000, 3),
+        'p99': round(percentile(durations, 99) * 1000, 3),
+    }
@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+from django.utils.translation import gettext_lazy as _
+
+
+class CoreConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'core'
+    verbose_name = _('Core')
+
+    def ready(self):
+        # Connect the database connection receivers & register the checks
+        from . import checks, databases, metrics  # noqa: F401
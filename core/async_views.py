@@ -0,0 +1,103 @@
+from asgiref.sync import sync_to_async
+
+from django.http import Http404
+
+from rest_framework import exceptions
+
+
+class AsyncAPIViewMixin:
+    """
+    Run a DRF view as a coroutine, its handlers (`get`, `post`...) are `async def` and use the async ORM & cache APIs.
+    The view keeps its authentication, permission & throttle classes. Authenticators with an `aauthenticate` method
+    are awaited, others run in a thread, and so do the throttles since their cache may be the database.
+    Permissions run as they are, they must not query the database.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await self.ainitial(request, *args, **kwargs)
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+            response = handler(request, *args, **kwargs)
+            if hasattr(response, '__await__'):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def ainitial(self, request, *args, **kwargs):
+        """Same as `APIView.initial`, with the authentication & throttling awaited"""
+        self.format_kwarg = self.get_format_suffix(**kwargs)
+        request.accepted_renderer, request.accepted_media_type = self.perform_content_negotiation(request)
+        request.version, request.versioning_scheme = self.determine_version(request, *args, **kwargs)
+
+        await self.aperform_authentication(request)
+        self.check_permissions(request)
+        if self.get_throttles():
+            await sync_to_async(self.check_throttles)(request)
+
+    async def aperform_authentication(self, request):
+        """Same as `Request._authenticate`, the user is set before the view reads it"""
+        for authenticator in request.authenticators:
+            try:
+                if hasattr(authenticator, 'aauthenticate'):
+                    user_auth_tuple = await authenticator.aauthenticate(request)
+                else:
+                    user_auth_tuple = await sync_to_async(authenticator.authenticate)(request)
+            except exceptions.APIException:
+                request._not_authenticated()
+                raise
+
+            if user_auth_tuple is not None:
+                request._authenticator = authenticator
+                request.user, request.auth = user_auth_tuple
+                return
+        request._not_authenticated()
+
+    async def aget_object(self):
+        """Same as `GenericAPIView.get_object`, with the object fetched by the async ORM"""
+        queryset = self.get_queryset()
+        if self.request.query_params:
+            # Filtersets validate the query params, which may query the database
+            queryset = await sync_to_async(self.filter_queryset)(queryset)
+        else:
+            queryset = self.filter_queryset(queryset)
+
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            obj = await queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]}).afirst()
+        except (TypeError, ValueError):
+            obj = None
+        if obj is None:
+            raise Http404
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+
+def method_dispatch(async_view, sync_view, methods=('GET', 'HEAD')):
+    """
+    Serve `methods` of a route with the async view, and its other methods with the sync one, e.g. the retrieve of a
+    viewset detail route, whose updates stay sync. The route is documented & measured as the sync view.
+    """
+    async_sync_view = sync_to_async(sync_view)
+
+    async def view(request, *args, **kwargs):
+        if request.method in methods:
+            return await async_view(request, *args, **kwargs)
+        return await async_sync_view(request, *args, **kwargs)
+
+    view.csrf_exempt = True
+    for attr in ('cls', 'initkwargs', 'actions', 'suffix', 'detail', 'basename'):
+        if hasattr(sync_view, attr):
+            setattr(view, attr, getattr(sync_view, attr))
+    return view
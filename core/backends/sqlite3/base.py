@@ -0,0 +1,13 @@
+from django.conf import settings
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    SQLite backend that starts the transactions with `SQLITE_TRANSACTION_MODE`.
+    A deferred transaction that reads then writes fails straight away when another connection has written meanwhile,
+    the busy timeout doesn't apply to it. An immediate one waits for the write lock when it starts instead.
+    """
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f'BEGIN {getattr(settings, "SQLITE_TRANSACTION_MODE", "DEFERRED")}')
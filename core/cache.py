@@ -0,0 +1,98 @@
+import os
+import time
+import zlib
+import base64
+import pickle
+import tempfile
+
+from django.db import connections, router, transaction
+from django.core.files import locks
+from django.core.cache.backends import db, filebased
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+
+class DatabaseCache(db.DatabaseCache):
+    """Same as the builtin database cache, with atomic increments that keep the expiry of the key"""
+
+    def incr(self, key, delta=1, version=None):
+        made_key = self.make_and_validate_key(key, version=version)
+        db_alias = router.db_for_write(self.cache_model_class)
+        connection = connections[db_alias]
+        quote_name = connection.ops.quote_name
+        table, cache_key = quote_name(self._table), quote_name('cache_key')
+
+        with transaction.atomic(using=db_alias), connection.cursor() as cursor:
+            # Lock the row of the key, concurrent increments wait for this one to commit before reading it
+            cursor.execute(f'UPDATE {table} SET {cache_key} = {cache_key} WHERE {cache_key} = %s', [made_key])
+            value = self.get(key, self._missing_key, version=version)
+            if value is self._missing_key:
+                raise ValueError(f"Key '{key}' not found")
+            value += delta
+            pickled = base64.b64encode(pickle.dumps(value, self.pickle_protocol)).decode('latin1')
+            cursor.execute(f'UPDATE {table} SET {quote_name("value")} = %s WHERE {cache_key} = %s',
+                           [pickled, made_key])
+        return value
+
+
+class FileBasedCache(filebased.FileBasedCache):
+    """Same as the builtin file based cache, with atomic adds & increments that keep the expiry of the key"""
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._createdir()
+        fname = self._key_to_file(key, version)
+        self._cull()
+        fd, tmp_path = tempfile.mkstemp(dir=self._dir)
+        try:
+            with open(fd, 'wb') as file:
+                self._write_content(file, timeout, value)
+            while True:
+                try:
+                    # Unlike the rename of `set`, the link fails when the file exists, only one concurrent add wins
+                    os.link(tmp_path, fname)
+                    return True
+                except FileExistsError:
+                    pass
+                try:
+                    with open(fname, 'r+b') as file:
+                        locks.lock(file, locks.LOCK_EX)
+                        try:
+                            # The file may have been deleted or replaced before being locked, add to the new one
+                            if not os.path.samestat(os.fstat(file.fileno()), os.stat(fname)):
+                                continue
+                            try:
+                                expiry = pickle.load(file)
+                            except EOFError:
+                                expiry = 0
+                            if expiry is None or expiry >= time.time():
+                                return False
+                            # Expired, replace it in place so the concurrent adds waiting for the lock see the value
+                            file.seek(0)
+                            self._write_content(file, timeout, value)
+                            file.truncate()
+                            return True
+                        finally:
+                            locks.unlock(file)
+                except FileNotFoundError:
+                    continue
+        finally:
+            os.remove(tmp_path)
+
+    def incr(self, key, delta=1, version=None):
+        try:
+            with open(self._key_to_file(key, version), 'r+b') as file:
+                # Concurrent increments wait for the lock of the file, `set` replaces the file instead of writing it
+                locks.lock(file, locks.LOCK_EX)
+                try:
+                    expiry = pickle.load(file)
+                    if expiry is not None and expiry < time.time():
+                        raise FileNotFoundError
+                    value = pickle.loads(zlib.decompress(file.read())) + delta
+                    file.seek(0)
+                    file.write(pickle.dumps(expiry, self.pickle_protocol))
+                    file.write(zlib.compress(pickle.dumps(value, self.pickle_protocol)))
+                    file.truncate()
+                finally:
+                    locks.unlock(file)
+        except (FileNotFoundError, EOFError):
+            raise ValueError(f"Key '{key}' not found")
+        return value
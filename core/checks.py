@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.checks import Error, register, Tags
+
+
+LOCAL_CACHE_BACKENDS = ['django.core.cache.backends.locmem.LocMemCache']
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    The info & main info versions, the cached users of the authentication, the profiles resolved by qr code, the
+    throttle counters & the primary database pins are invalidated through the default cache, a local cache keeps
+    serving stale entries in the other worker processes.
+    """
+    if settings.WEB_CONCURRENCY <= 1 or settings.CACHES['default']['BACKEND'] not in LOCAL_CACHE_BACKENDS:
+        return []
+    return [Error(
+        f'The default cache is local to each process while the server runs {settings.WEB_CONCURRENCY} workers.',
+        hint='Set CACHE_URL to a cache shared by the workers, e.g. `filecache:///var/tmp/finder`, '
+             '`dbcache://finder_cache` or `rediscache://`.',
+        id='core.E001',
+    )]
@@ -0,0 +1,178 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from django.conf import settings
+from django.dispatch import receiver
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+
+
+DEFAULT_SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 20000,
+    'mmap_size': 128 * 1024 * 1024,
+}
+DEFAULT_PRIMARY_PIN_SECONDS = 10
+DEFAULT_PRIMARY_PIN_COOKIE_NAME = 'db_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# Rows of the database cache are shared state of the processes, not data of the requests
+PRIMARY_ONLY_APP_LABELS = ('django_cache',)
+
+
+class RoutingState:
+    """Database routing of the current request, replicas are only read by safe requests that haven't written"""
+
+    def __init__(self, use_replicas: bool):
+        self.use_replicas = use_replicas
+        self.has_written = False
+        # Authenticated user, pinned to the primary from every client once the request has written
+        self.user_id = None
+
+
+# Outside the requests, e.g. in commands & workers, everything goes to the primary
+routing_state = ContextVar('routing_state', default=None)
+
+
+def get_replicas() -> list:
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def get_pin_seconds() -> int:
+    return getattr(settings, 'DATABASE_PRIMARY_PIN_SECONDS', DEFAULT_PRIMARY_PIN_SECONDS)
+
+
+def get_user_pin_cache_key(user_id) -> str:
+    return f'db:primary:user:{user_id}'
+
+
+@contextmanager
+def read_from_primary():
+    """Read from the primary in the block, e.g. to fill a cache that a write may have just invalidated"""
+    token = routing_state.set(None)
+    try:
+        yield
+    finally:
+        routing_state.reset(token)
+
+
+def set_routing_user(user_id):
+    """
+    Set the authenticated user of the request, once it's known, e.g. by the API authentication.
+    Clients without cookies, like the API clients, are pinned to the primary by their user in the cache instead.
+    """
+    state = routing_state.get()
+    if state is None or not get_replicas():
+        return
+    state.user_id = user_id
+    if state.use_replicas and cache.get(get_user_pin_cache_key(user_id)):
+        state.use_replicas = False
+
+
+async def aset_routing_user(user_id):
+    """Same as `set_routing_user`, for async views"""
+    state = routing_state.get()
+    if state is None or not get_replicas():
+        return
+    state.user_id = user_id
+    if state.use_replicas and await cache.aget(get_user_pin_cache_key(user_id)):
+        state.use_replicas = False
+
+
+class ReplicaRouter:
+    """
+    Send the reads of safe requests to a random replica, and everything else to the primary.
+    Once a request writes, its next reads go to the primary, and so do the requests of the same client, or user,
+    during `DATABASE_PRIMARY_PIN_SECONDS`, so that it reads its own writes whatever the replication lag is.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = routing_state.get()
+        replicas = get_replicas()
+        if (
+            state is None or not state.use_replicas or not replicas
+            or model._meta.app_label in PRIMARY_ONLY_APP_LABELS
+            # Reads of a transaction must see its own writes
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = routing_state.get()
+        if state is not None and model._meta.app_label not in PRIMARY_ONLY_APP_LABELS:
+            state.use_replicas = False
+            state.has_written = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Route the queries of the request, and pin the client to the primary with a cookie once it has written,
+    as well as its authenticated user, see `set_routing_user`.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        state = self.get_state(request)
+        token = routing_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            routing_state.reset(token)
+        if state.has_written and state.user_id is not None:
+            cache.set(get_user_pin_cache_key(state.user_id), True, get_pin_seconds())
+        return self.process_response(response, state)
+
+    async def __acall__(self, request):
+        state = self.get_state(request)
+        # The state is copied with the context to the threads that the async view runs its queries in
+        token = routing_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            routing_state.reset(token)
+        if state.has_written and state.user_id is not None:
+            await cache.aset(get_user_pin_cache_key(state.user_id), True, get_pin_seconds())
+        return self.process_response(response, state)
+
+    def get_cookie_name(self) -> str:
+        return getattr(settings, 'DATABASE_PRIMARY_PIN_COOKIE_NAME', DEFAULT_PRIMARY_PIN_COOKIE_NAME)
+
+    def get_state(self, request) -> RoutingState:
+        return RoutingState(request.method in SAFE_METHODS and self.get_cookie_name() not in request.COOKIES)
+
+    def process_response(self, response, state: RoutingState):
+        if state.has_written and get_replicas():
+            response.set_cookie(self.get_cookie_name(), '1', httponly=True, samesite='Lax', max_age=get_pin_seconds())
+        return response
+
+
+@receiver(connection_created)
+def configure_sqlite_connection(sender, connection, **kwargs):
+    """SQLite pragmas only last as long as the connection, except for the journal mode"""
+    if connection.vendor != 'sqlite':
+        return
+    for name, value in getattr(settings, 'SQLITE_PRAGMAS', DEFAULT_SQLITE_PRAGMAS).items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
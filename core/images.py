@@ -0,0 +1,287 @@
+import os
+import logging
+import threading
+import multiprocessing
+from io import BytesIO
+from typing import Optional
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.db import transaction, close_old_connections
+from django.dispatch import Signal
+from django.core.files.base import ContentFile
+from django.db.models.signals import post_save
+
+from PIL import Image, ImageOps
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_IMAGE_VARIANTS = {
+    'avatar': [64, 128, 256, 512],
+    'cover': [640, 1280, 1920],
+    'header': [640, 1280, 1920],
+}
+DEFAULT_IMAGE_VARIANT_FORMATS = ['webp', 'jpeg']
+DEFAULT_IMAGE_VARIANT_QUALITY = 80
+DEFAULT_IMAGE_PROCESSING_WORKERS = 2
+ORIGINAL_IMAGE_QUALITY = 90
+
+FORMAT_EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+
+# (model, image field name, variants kind) of every image field with variants
+image_variant_fields = []
+
+# The image has been processed & its variants have been stored. Args: instance, field_name.
+image_variants_updated = Signal()
+
+
+def get_variant_widths(kind: str) -> list:
+    return {**DEFAULT_IMAGE_VARIANTS, **getattr(settings, 'IMAGE_VARIANTS', {})}[kind]
+
+
+def get_variant_formats() -> list:
+    return getattr(settings, 'IMAGE_VARIANT_FORMATS', DEFAULT_IMAGE_VARIANT_FORMATS)
+
+
+def get_variant_name(name: str, width: int, image_format: str) -> str:
+    """Variants are stored beside the original, `images/me.png` -> `images/me_256w.webp`"""
+    root, _ = os.path.splitext(name)
+    return f'{root}_{width}w.{FORMAT_EXTENSIONS[image_format]}'
+
+
+def get_variants_field_name(field_name: str) -> str:
+    return f'{field_name}_variants'
+
+
+def is_image_processed(field_file, variants: dict) -> bool:
+    """Whether the image has been cleaned & its variants have been generated, so it can be served"""
+    return bool(field_file) and (variants or {}).get('source') == field_file.name
+
+
+def is_image_pending(field_file, variants: dict) -> bool:
+    """
+    Whether the image is waiting to be processed. Images uploaded before the variants existed have none, they are
+    served as they are until `regenerate_image_variants` processes them.
+    """
+    return bool(field_file) and bool(variants) and not is_image_processed(field_file, variants)
+
+
+def encode_image(image: Image.Image, image_format: str, quality: int) -> bytes:
+    if image_format.upper() == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    options = {'icc_profile': image.info['icc_profile']} if 'icc_profile' in image.info else {}
+    output = BytesIO()
+    image.save(output, format=image_format.upper(), quality=quality, optimize=True, **options)
+    return output.getvalue()
+
+
+def process_image_data(data: bytes, widths: list, formats: list, quality: int, reencode: bool = True):
+    """
+    Decode the image, rotate it by its EXIF orientation, and resize it to each of `widths` in every one of `formats`.
+    With `reencode`, the original is encoded again without its metadata (EXIF, GPS, comments...).
+    Widths larger than the original are skipped, the original width is used instead when all of them are.
+    It only uses Pillow, so it can run in a worker process. Return `(original bytes or None, {format: {width: bytes}})`.
+    """
+    image = Image.open(BytesIO(data))
+    image_format = image.format
+    image = ImageOps.exif_transpose(image)
+    # Drop the metadata, only keep what is needed to render the image the same
+    image.info = {key: value for key, value in image.info.items() if key in ('icc_profile', 'transparency')}
+    original = encode_image(image, image_format, ORIGINAL_IMAGE_QUALITY) if reencode else None
+
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+    variants = {}
+    for variant_format in formats:
+        variants[variant_format] = {}
+        for width in sorted({width for width in widths if width <= image.width}) or [image.width]:
+            variant = image.copy()
+            variant.thumbnail((width, image.height), Image.Resampling.LANCZOS)
+            variants[variant_format][str(width)] = encode_image(variant, variant_format, quality)
+    return original, variants
+
+
+def delete_variants(storage, variants: dict, keep=()):
+    for names in (variants or {}).get('formats', {}).values():
+        for name in names.values():
+            if name not in keep:
+                storage.delete(name)
+
+
+class ImageProcessor:
+    """
+    Clean uploaded images and generate their variants out of the request.
+    The Pillow work runs in a pool of `IMAGE_PROCESSING_WORKERS` processes, fed by as many threads that read the
+    uploads & store the results. With no workers, images are processed inline when they are saved.
+    Until an image is processed, its stored variants don't match it, and it should be served by a placeholder.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._threads = None
+        self._processes = None
+
+    @property
+    def workers(self) -> int:
+        return getattr(settings, 'IMAGE_PROCESSING_WORKERS', DEFAULT_IMAGE_PROCESSING_WORKERS)
+
+    def _create_process_pool(self):
+        # Forking a process with running threads may deadlock it, start clean interpreters instead
+        return ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+
+    def _start(self):
+        with self._lock:
+            if self._processes is None:
+                self._processes = self._create_process_pool()
+                self._threads = ThreadPoolExecutor(self.workers, thread_name_prefix='image-processor')
+
+    def submit(self, instance, field_name: str, kind: str):
+        model, name = type(instance), getattr(instance, field_name).name
+        if not self.workers:
+            if self.process(model, instance.pk, field_name, kind, name):
+                instance.refresh_from_db(fields=[field_name, get_variants_field_name(field_name)])
+            return
+
+        key = (model, instance.pk, field_name, name)
+        with self._lock:
+            if key in self._pending:
+                return
+            self._pending.add(key)
+        self._start()
+        # The worker must see the committed image name, or it would assume that the image has changed meanwhile
+        transaction.on_commit(lambda: self._threads.submit(self._run, key, kind))
+
+    def _run(self, key, kind: str):
+        try:
+            model, pk, field_name, name = key
+            self.process(model, pk, field_name, kind, name)
+        except Exception:
+            logger.exception('Failed to process the image %s of %s %s', key[3], key[0].__name__, key[1])
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+            close_old_connections()
+
+    def process(self, model, pk, field_name: str, kind: str, name: str) -> bool:
+        """Process the image `name` of the instance, return whether it is still the image of the instance"""
+        storage = model._meta.get_field(field_name).storage
+        variants_field_name = get_variants_field_name(field_name)
+        old_variants = model._base_manager.filter(pk=pk).values_list(variants_field_name, flat=True).first() or {}
+        # Images are cleaned once, regenerating the variants shouldn't degrade them by encoding them again
+        reencode = old_variants.get('source') != name
+
+        with storage.open(name) as file:
+            args = (file.read(), get_variant_widths(kind), get_variant_formats(),
+                    getattr(settings, 'IMAGE_VARIANT_QUALITY', DEFAULT_IMAGE_VARIANT_QUALITY), reencode)
+        if self._processes is not None:
+            try:
+                original, images = self._processes.submit(process_image_data, *args).result()
+            except BrokenProcessPool:
+                # A worker died, replace the pool so that the next images are still processed
+                with self._lock:
+                    self._processes = self._create_process_pool()
+                raise
+        else:
+            original, images = process_image_data(*args)
+
+        new_name = name
+        if original is not None:
+            storage.delete(name)
+            new_name = storage.save(name, ContentFile(original))
+        # The storage picks free names, originals with the same root don't overwrite each other's variants
+        variants = {'source': new_name, 'formats': {
+            variant_format: {
+                width: storage.save(get_variant_name(new_name, int(width), variant_format), ContentFile(data))
+                for width, data in widths.items()
+            }
+            for variant_format, widths in images.items()
+        }}
+
+        # Update the columns only, saving the instance would process it again
+        updated = model._base_manager.filter(pk=pk, **{field_name: name}).update(
+            **{field_name: new_name, variants_field_name: variants}
+        )
+        if not updated:
+            # Another image has been uploaded meanwhile
+            delete_variants(storage, variants)
+            return False
+
+        delete_variants(storage, old_variants)
+        image_variants_updated.send(sender=model, instance=model._base_manager.get(pk=pk), field_name=field_name)
+        return True
+
+
+image_processor = ImageProcessor()
+
+
+def clear_image_variants(instance, field_name: str):
+    variants_field_name = get_variants_field_name(field_name)
+    delete_variants(getattr(instance, field_name).storage, getattr(instance, variants_field_name))
+    type(instance)._base_manager.filter(pk=instance.pk).update(**{variants_field_name: {}})
+    setattr(instance, variants_field_name, {})
+
+
+def update_image_variants(instance, field_name: str, kind: str, force: bool = False) -> bool:
+    """Process the image inline when it has changed, or always with `force`, return whether it was processed"""
+    field_file = getattr(instance, field_name)
+    if not force and is_image_processed(field_file, getattr(instance, get_variants_field_name(field_name))):
+        return False
+    if not field_file:
+        clear_image_variants(instance, field_name)
+        return True
+    return image_processor.process(type(instance), instance.pk, field_name, kind, field_file.name)
+
+
+def update_instance_image_variants(sender, instance, raw=False, *args, **kwargs):
+    if raw:
+        return
+    for model, field_name, kind in image_variant_fields:
+        if model is not sender:
+            continue
+        field_file = getattr(instance, field_name)
+        variants = getattr(instance, get_variants_field_name(field_name))
+        if not field_file:
+            if variants:
+                clear_image_variants(instance, field_name)
+        elif not is_image_processed(field_file, variants):
+            if not variants:
+                # Mark the first image of the instance as pending, unlike the images older than the variants
+                variants = {'pending': field_file.name}
+                type(instance)._base_manager.filter(pk=instance.pk).update(
+                    **{get_variants_field_name(field_name): variants}
+                )
+                setattr(instance, get_variants_field_name(field_name), variants)
+            image_processor.submit(instance, field_name, kind)
+
+
+def register_image_variants(model, field_name: str, kind: str):
+    """Keep the variants of `model.<field_name>` in `model.<field_name>_variants`, generated when it is saved"""
+    image_variant_fields.append((model, field_name, kind))
+    post_save.connect(update_instance_image_variants, sender=model, dispatch_uid=f'image_variants_{model.__name__}')
+
+
+def get_variant_url(field_file, variants: dict, min_width: int, image_format: str = 'jpeg') -> Optional[str]:
+    """URL of the smallest variant at least `min_width` wide, or of the largest one"""
+    names = (variants or {}).get('formats', {}).get(image_format)
+    if not names or not is_image_processed(field_file, variants):
+        return None
+    widths = sorted(map(int, names))
+    width = next((width for width in widths if width >= min_width), widths[-1])
+    return field_file.storage.url(names[str(width)])
+
+
+def get_srcset(field_file, variants: dict, build_url=None) -> Optional[dict]:
+    """`srcset` attribute values of every variant format, `{format: 'url 64w, url 128w'}`"""
+    if not is_image_processed(field_file, variants):
+        return None
+    build_url = build_url or (lambda url: url)
+    return {
+        image_format: ', '.join(
+            f'{build_url(field_file.storage.url(name))} {width}w'
+            for width, name in sorted(names.items(), key=lambda item: int(item[0]))
+        )
+        for image_format, names in variants.get('formats', {}).items()
+    }
@@ -0,0 +1,240 @@
+import json
+import threading
+from time import perf_counter
+from contextvars import ContextVar
+from collections import defaultdict
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from django.conf import settings
+from django.dispatch import receiver
+from django.db.backends.signals import connection_created
+
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework.renderers import BaseRenderer
+from rest_framework.permissions import IsAdminUser
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema
+
+
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class RequestMetrics:
+    """Database & serialization costs of a single request"""
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.serializer_time = 0.0
+        self.duration = 0.0
+        self.response_size = 0
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql_time += perf_counter() - start
+
+
+class Histogram:
+    """Prometheus histogram with an `endpoint` label, its buckets count the observations since the process started"""
+
+    def __init__(self, name: str, documentation: str, buckets: tuple):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counts = defaultdict(lambda: [0] * len(self.buckets))
+        self._sums = defaultdict(float)
+        self._totals = defaultdict(int)
+
+    def observe(self, endpoint: str, value: float):
+        with self._lock:
+            counts = self._counts[endpoint]
+            for i, bucket in enumerate(self.buckets):
+                if value <= bucket:
+                    counts[i] += 1
+            self._sums[endpoint] += value
+            self._totals[endpoint] += 1
+
+    def render(self) -> list:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for endpoint in sorted(self._totals):
+                label = endpoint.replace('\\', '\\\\').replace('"', '\\"')
+                for bucket, count in zip(self.buckets, self._counts[endpoint]):
+                    lines.append(f'{self.name}_bucket{{endpoint="{label}",le="{bucket}"}} {count}')
+                lines.append(f'{self.name}_bucket{{endpoint="{label}",le="+Inf"}} {self._totals[endpoint]}')
+                lines.append(f'{self.name}_sum{{endpoint="{label}"}} {self._sums[endpoint]}')
+                lines.append(f'{self.name}_count{{endpoint="{label}"}} {self._totals[endpoint]}')
+        return lines
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self.histograms = {
+            'duration': Histogram('http_request_duration_seconds', 'Time to handle the request.', TIME_BUCKETS),
+            'queries': Histogram('db_queries_per_request', 'Number of database queries of the request.',
+                                 QUERY_COUNT_BUCKETS),
+            'sql_time': Histogram('db_query_duration_seconds',
+                                  'Time spent running the database queries of the request.', TIME_BUCKETS),
+            'serializer_time': Histogram('serializer_duration_seconds',
+                                         'Time spent serializing the response, including the queries it runs.',
+                                         TIME_BUCKETS),
+            'response_size': Histogram('http_response_size_bytes', 'Size of the response body.', SIZE_BUCKETS),
+        }
+
+    def observe(self, endpoint: str, metrics: RequestMetrics):
+        for attr, histogram in self.histograms.items():
+            histogram.observe(endpoint, getattr(metrics, attr))
+
+    def render(self) -> str:
+        return '\n'.join(line for histogram in self.histograms.values() for line in histogram.render()) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+# Metrics of the current request, the context is copied to the threads that async views run their queries in
+current_metrics = ContextVar('current_metrics', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics.execute_wrapper(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def wrap_connection_queries(sender, connection, **kwargs):
+    """Connections belong to a thread, wrap each one of them once instead of wrapping the connections per request"""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def get_endpoint(request) -> str:
+    """Name of the handling view, `<viewset>.<action>` for DRF views, e.g. `ProfileViewSet.list`"""
+    match = request.resolver_match
+    if match is None:
+        return 'unmatched'
+    view_class = getattr(match.func, 'cls', None)
+    if view_class is None:
+        return match.view_name or match._func_path
+    method = request.method.lower()
+    action = (getattr(match.func, 'actions', None) or {}).get(method, method)
+    return f'{view_class.__name__}.{action}'
+
+
+def get_response_size(response) -> int:
+    if response.streaming:
+        return int(response.get('Content-Length') or 0)
+    return len(response.content)
+
+
+class QueryMetricsMiddleware:
+    """
+    Record the query count, SQL time, serialization time, duration and response size of every request in the
+    process histograms, per endpoint. In debug mode, the numbers are sent back in the response headers as well.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            return self.get_response(request)
+
+        request.metrics = metrics = RequestMetrics()
+        start = perf_counter()
+        token = current_metrics.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.process_response(request, response, metrics, start)
+
+    async def __acall__(self, request):
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            return await self.get_response(request)
+
+        request.metrics = metrics = RequestMetrics()
+        start = perf_counter()
+        token = current_metrics.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.process_response(request, response, metrics, start)
+
+    def process_response(self, request, response, metrics: RequestMetrics, start: float):
+        metrics.duration = perf_counter() - start
+        metrics.response_size = get_response_size(response)
+        registry.observe(get_endpoint(request), metrics)
+
+        if settings.DEBUG:
+            response.headers['X-DB-Queries'] = str(metrics.queries)
+            response.headers['Server-Timing'] = ', '.join([
+                f'db;dur={metrics.sql_time * 1000:.2f}',
+                f'serializer;dur={metrics.serializer_time * 1000:.2f}',
+                f'total;dur={metrics.duration * 1000:.2f}',
+            ])
+        return response
+
+
+class SerializerMetricsMixin:
+    """Time the serialization of the view serializers, recorded with the metrics of the request"""
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        metrics = getattr(self.request, 'metrics', None)
+        if metrics is None:
+            return serializer
+
+        to_representation = serializer.to_representation
+
+        def timed_to_representation(instance):
+            start = perf_counter()
+            try:
+                return to_representation(instance)
+            finally:
+                metrics.serializer_time += perf_counter() - start
+
+        serializer.to_representation = timed_to_representation
+        return serializer
+
+
+class PrometheusRenderer(BaseRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, str):
+            return data.encode(self.charset)
+        return json.dumps(data).encode(self.charset)
+
+
+class MetricsAPIView(APIView):
+    """Request metrics of this process in the Prometheus text format"""
+    permission_classes = [IsAdminUser]
+    renderer_classes = [PrometheusRenderer]
+
+    @extend_schema(responses={(200, 'text/plain'): OpenApiTypes.STR})
+    def get(self, request, *args, **kwargs):
+        return Response(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
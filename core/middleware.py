@@ -0,0 +1,15 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from social_django import middleware
+
+
+class SocialAuthExceptionMiddleware(middleware.SocialAuthExceptionMiddleware):
+    """Sync & async capable version of the social auth middleware, it only passes the request through"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
@@ -0,0 +1,70 @@
+import os
+import hashlib
+import threading
+from io import BytesIO
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+try:
+    import qrcode
+    from qrcode.image.svg import SvgPathImage
+except ImportError:
+    qrcode = None
+
+
+DEFAULT_QR_CODE_CONTENT = '{qr_code}'
+DEFAULT_QR_CODE_BOX_SIZE = 10
+DEFAULT_QR_CODE_BORDER = 4
+
+QR_CODE_CONTENT_TYPES = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+
+
+def get_qr_code_options() -> dict:
+    """Rendering options from the settings, passed to `render_qr_code_files` as is, so it can run in a worker process"""
+    options = {
+        'content': getattr(settings, 'QR_CODE_CONTENT', DEFAULT_QR_CODE_CONTENT),
+        'box_size': getattr(settings, 'QR_CODE_BOX_SIZE', DEFAULT_QR_CODE_BOX_SIZE),
+        'border': getattr(settings, 'QR_CODE_BORDER', DEFAULT_QR_CODE_BORDER),
+    }
+    # Images rendered with other options are kept apart, changing the settings doesn't serve outdated images
+    version = hashlib.md5(repr(sorted(options.items())).encode()).hexdigest()[:8]
+    cache_dir = getattr(settings, 'QR_CODE_CACHE_DIR', Path(settings.MEDIA_ROOT) / 'qr_codes')
+    return {**options, 'cache_dir': str(Path(cache_dir) / version)}
+
+
+def render_qr_code(content: str, image_format: str = 'png', box_size: int = DEFAULT_QR_CODE_BOX_SIZE,
+                   border: int = DEFAULT_QR_CODE_BORDER) -> bytes:
+    if qrcode is None:
+        raise ImproperlyConfigured('Rendering QR codes requires the `qrcode` package')
+    qr = qrcode.QRCode(box_size=box_size, border=border,
+                       image_factory=SvgPathImage if image_format == 'svg' else None)
+    qr.add_data(content)
+    qr.make(fit=True)
+    output = BytesIO()
+    qr.make_image().save(output)
+    return output.getvalue()
+
+
+def get_qr_code_file(qr_code: int, image_format: str, options: dict = None) -> Path:
+    """Path of the rendered QR code image in the on-disk cache, it is rendered on the first use"""
+    options = options or get_qr_code_options()
+    path = Path(options['cache_dir']) / f'{qr_code}.{image_format}'
+    if not path.exists():
+        data = render_qr_code(options['content'].format(qr_code=qr_code), image_format, options['box_size'],
+                              options['border'])
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write then move, concurrent readers never see a partial image
+        temp_path = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+        temp_path.write_bytes(data)
+        os.replace(temp_path, path)
+    return path
+
+
+def render_qr_code_files(qr_codes: list, image_format: str, options: dict) -> list:
+    """Render a batch of QR codes through the cache, return `[(qr_code, image bytes), ...]`"""
+    return [(qr_code, get_qr_code_file(qr_code, image_format, options).read_bytes()) for qr_code in qr_codes]
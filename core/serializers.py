@@ -0,0 +1,22 @@
+from rest_framework import serializers
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema_field
+
+from .images import get_srcset, get_variants_field_name
+
+
+@extend_schema_field(OpenApiTypes.OBJECT)
+class ImageSrcsetField(serializers.Field):
+    """`srcset` values of the variants of an image field per format, `{'webp': 'url 64w, url 128w', ...}`"""
+
+    def __init__(self, image_field: str, **kwargs):
+        self.image_field = image_field
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        request = self.context.get('request')
+        return get_srcset(getattr(instance, self.image_field),
+                          getattr(instance, get_variants_field_name(self.image_field)),
+                          request.build_absolute_uri if request is not None else None)
@@ -24,7 +24,8 @@ env = environ.Env(
     SEND_ACTIVATION_EMAIL=(bool, True),
     SEND_CONFIRMATION_EMAIL=(bool, True),
     USERNAME_CHANGED_EMAIL_CONFIRMATION=(bool, True),
-    PASSWORD_CHANGED_EMAIL_CONFIRMATION=(bool, True)
+    PASSWORD_CHANGED_EMAIL_CONFIRMATION=(bool, True),
+    EMAIL_USE_OUTBOX=(bool, True)
 )
 environ.Env.read_env()
 
@@ -61,7 +62,6 @@ INSTALLED_APPS = [
 
     # Third party apps
     'corsheaders',
-    'django_middleware_global_request',
     "rest_framework",
     "rest_framework.authtoken",
     'djoser',
@@ -72,14 +72,20 @@ INSTALLED_APPS = [
     'drf_spectacular',
 
     # Custom apps
+    'core',
     'accounts',
-    'info'
+    'info',
 ]
 
+# The benchmark commands seed & delete users, they are only available in debug or when explicitly enabled
+if env.bool('BENCHMARKS_ENABLED', default=DEBUG):
+    INSTALLED_APPS.append('benchmarks')
+
 MIDDLEWARE = [
+    'core.metrics.QueryMetricsMiddleware',
+    'core.databases.ReplicaRoutingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
-    'django_middleware_global_request.middleware.GlobalRequestMiddleware',
-    'social_django.middleware.SocialAuthExceptionMiddleware',
+    'core.middleware.SocialAuthExceptionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',
@@ -112,17 +118,72 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'core.wsgi.application'
 
+# Serve the profile retrieve, QR scans & info pages with async views. Only worth it under ASGI with async database &
+# cache backends, under WSGI every request of these views pays for `async_to_sync`
+ASYNC_VIEWS = env.bool('ASYNC_VIEWS', default=False)
+
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# Connections are kept open between requests, and checked before being reused
+DATABASE_CONNECTION_OPTIONS = {
+    'CONN_MAX_AGE': env.int('DATABASE_CONN_MAX_AGE', default=60),
+    'CONN_HEALTH_CHECKS': env.bool('DATABASE_CONN_HEALTH_CHECKS', default=True),
+}
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        **env.db('DATABASE_URL', default=f'sqlite:///{BASE_DIR / "db.sqlite3"}'),
+        **DATABASE_CONNECTION_OPTIONS,
     }
 }
 
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    # Same as the builtin backend, with a configurable transaction mode, see SQLITE_TRANSACTION_MODE
+    DATABASES['default']['ENGINE'] = 'core.backends.sqlite3'
+
+# Read replicas of the primary, `replica_0`, `replica_1`..., in tests they are the primary itself
+DATABASE_REPLICA_URLS = env.list('DATABASE_REPLICA_URLS', default=[])
+DATABASE_REPLICAS = [f'replica_{i}' for i in range(len(DATABASE_REPLICA_URLS))]
+DATABASES.update({
+    alias: {**env.db_url_config(url), **DATABASE_CONNECTION_OPTIONS, 'TEST': {'MIRROR': 'default'}}
+    for alias, url in zip(DATABASE_REPLICAS, DATABASE_REPLICA_URLS)
+})
+DATABASE_ROUTERS = ['core.databases.ReplicaRouter']
+# Safe requests read from the replicas, unless the client has written less than this many seconds ago
+DATABASE_PRIMARY_PIN_SECONDS = env.int('DATABASE_PRIMARY_PIN_SECONDS', default=10)
+DATABASE_PRIMARY_PIN_COOKIE_NAME = env('DATABASE_PRIMARY_PIN_COOKIE_NAME', default='db_primary')
+
+# Applied to every new SQLite connection, WAL lets the requests read while another one writes
+SQLITE_PRAGMAS = {
+    'journal_mode': env('SQLITE_JOURNAL_MODE', default='wal'),
+    'synchronous': env('SQLITE_SYNCHRONOUS', default='normal'),
+    'busy_timeout': env.int('SQLITE_BUSY_TIMEOUT', default=20000),
+    'mmap_size': env.int('SQLITE_MMAP_SIZE', default=128 * 1024 * 1024),
+}
+# Transactions take the write lock when they start, instead of failing when they write after another connection did
+SQLITE_TRANSACTION_MODE = env('SQLITE_TRANSACTION_MODE', default='IMMEDIATE')
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/ref/settings/#caches
+
+# Local memory by default, use a cache shared by the processes when running several of them, e.g.
+# `filecache:///var/tmp/finder`, `dbcache://finder_cache` (created by `createcachetable`) or `rediscache://`
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
+# Same as the builtin backends, with atomic increments for the throttle counters
+CACHES['default']['BACKEND'] = {
+    'django.core.cache.backends.db.DatabaseCache': 'core.cache.DatabaseCache',
+    'django.core.cache.backends.filebased.FileBasedCache': 'core.cache.FileBasedCache',
+}.get(CACHES['default']['BACKEND'], CACHES['default']['BACKEND'])
+
+# Number of server worker processes, also read by uvicorn & gunicorn. With several workers the invalidations of the
+# cached data have to reach all of them, the `core.E001` check requires a shared cache then
+WEB_CONCURRENCY = env.int('WEB_CONCURRENCY', default=1)
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -187,7 +248,7 @@ AUTHENTICATION_BACKENDS = (
 # RestAPI Settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.api.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_FILTER_BACKENDS': (
         'django_filters.rest_framework.DjangoFilterBackend',
@@ -198,10 +259,12 @@ REST_FRAMEWORK = {
         'rest_framework.renderers.BrowsableAPIRenderer',
     ],
     'DEFAULT_THROTTLE_RATES': {
-        'update': '1/day'
+        'update': '1/day',
+        'scan': env('SCAN_THROTTLE_RATE', default='60/minute'),
+        'contact_us': env('CONTACT_US_THROTTLE_RATE', default='5/hour'),
     },
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'accounts.api.pagination.KeysetOrPageNumberPagination',
     'PAGE_SIZE': 20,
     "DATETIME_FORMAT": "%Y-%m-%d %H:%M:%S",
     "DATETIME_INPUT_FORMAT": "%Y-%m-%d %H:%M:%S"
@@ -561,7 +624,9 @@ CORS_ALLOW_METHODS = [
 
 
 # Email Settings
-EMAIL_BACKEND = env('EMAIL_BACKEND')
+# Emails are queued in the outbox and sent by the `send_queued_mail` worker through OUTBOX_EMAIL_BACKEND
+OUTBOX_EMAIL_BACKEND = env('EMAIL_BACKEND')
+EMAIL_BACKEND = 'accounts.email.OutboxEmailBackend' if env('EMAIL_USE_OUTBOX') else OUTBOX_EMAIL_BACKEND
 EMAIL_HOST = env('EMAIL_HOST')
 EMAIL_PORT = env('EMAIL_PORT')
 EMAIL_HOST_USER = env('EMAIL_HOST_USER')
@@ -723,3 +788,49 @@ TRANSLATABLE_MODEL_MODULES = [
 LOCALE_PATHS = [
     BASE_DIR / 'locale'
 ]
+
+
+# QR Code Settings
+QR_CODE_BLOCK_SIZE = env.int('QR_CODE_BLOCK_SIZE', default=100)
+# Encoded text of the rendered QR codes, formatted with the profile `qr_code`
+QR_CODE_CONTENT = env('QR_CODE_CONTENT', default='{qr_code}')
+QR_CODE_BOX_SIZE = env.int('QR_CODE_BOX_SIZE', default=10)
+QR_CODE_BORDER = env.int('QR_CODE_BORDER', default=4)
+QR_CODE_CACHE_DIR = MEDIA_ROOT / 'qr_codes'
+# Profiles resolved by their qr code are cached for this number of seconds
+PROFILE_QR_CODE_CACHE_TIMEOUT = env.int('PROFILE_QR_CODE_CACHE_TIMEOUT', default=60 * 5)
+
+
+# Visit Log Settings
+VISIT_LOG_BUFFER = {
+    'ENABLED': env.bool('VISIT_LOG_BUFFER_ENABLED', default=False),
+    'MAX_SIZE': env.int('VISIT_LOG_BUFFER_MAX_SIZE', default=500),
+    'FLUSH_INTERVAL': env.float('VISIT_LOG_BUFFER_FLUSH_INTERVAL', default=5),
+    'BATCH_SIZE': 500,
+    'MAX_PENDING': env.int('VISIT_LOG_BUFFER_MAX_PENDING', default=10000),
+}
+
+
+# Info Settings
+INFO_CACHE_TIMEOUT = env.int('INFO_CACHE_TIMEOUT', default=60 * 60 * 24)
+
+
+# Authentication Settings
+AUTH_USER_CACHE_TIMEOUT = env.int('AUTH_USER_CACHE_TIMEOUT', default=60)
+
+
+# Image Variants Settings
+IMAGE_VARIANTS = {
+    'avatar': [64, 128, 256, 512],
+    'cover': [640, 1280, 1920],
+    'header': [640, 1280, 1920],
+}
+IMAGE_VARIANT_FORMATS = ['webp', 'jpeg']
+IMAGE_VARIANT_QUALITY = env.int('IMAGE_VARIANT_QUALITY', default=80)
+# Uploaded images are processed by this number of worker processes, 0 processes them inline in the request
+IMAGE_PROCESSING_WORKERS = env.int('IMAGE_PROCESSING_WORKERS', default=2)
+
+
+# Metrics Settings
+# Record the query count & timings of the requests, served at /api/metrics/ to admins
+METRICS_ENABLED = env.bool('METRICS_ENABLED', default=True)
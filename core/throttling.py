@@ -0,0 +1,38 @@
+import math
+
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class FixedWindowRateThrottle(SimpleRateThrottle):
+    """
+    Count the requests of every client in fixed windows of the rate duration, e.g. the current minute of `60/minute`,
+    with a single counter incremented by the cache, instead of storing the time of every request.
+    The counter is shared by the processes as long as the cache is, clients may make up to twice the rate across the
+    end of a window. Combine it with a throttle that identifies the client, e.g. `UserRateThrottle`.
+    """
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        window = int(self.now // self.duration)
+        self.window_end = (window + 1) * self.duration
+        key = f'{self.key}:{window}'
+        # The first request of the window creates the counter, it expires with the window
+        if self.cache.add(key, 1, math.ceil(self.window_end - self.now)):
+            count = 1
+        else:
+            try:
+                count = self.cache.incr(key)
+            except ValueError:
+                # The counter has expired in between, the next window has started
+                return self.allow_request(request, view)
+        return count <= self.num_requests
+
+    def wait(self):
+        return self.window_end - self.now
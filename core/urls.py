@@ -26,6 +26,8 @@ from django.views.i18n import JavaScriptCatalog
 from drf_spectacular.views import (SpectacularAPIView, SpectacularRedocView, SpectacularSwaggerView,
                                    SpectacularJSONAPIView)
 
+from core.metrics import MetricsAPIView
+
 
 urlpatterns = [
     # Admin page
@@ -43,6 +45,9 @@ urlpatterns = [
     path('api/redoc/', SpectacularRedocView.as_view(url_name='schema'), name='redoc'),
     path('api/json/', SpectacularJSONAPIView.as_view(), name='spec_json'),
 
+    # Metrics
+    path('api/metrics/', MetricsAPIView.as_view(), name='metrics'),
+
     # Custom Apps
     path('api/', include('accounts.api.urls', namespace='accounts')),
     path('api/', include('info.api.urls', namespace='info')),
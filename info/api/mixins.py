@@ -0,0 +1,61 @@
+from asgiref.sync import sync_to_async
+
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from rest_framework import status
+from rest_framework.response import Response
+
+from core.databases import read_from_primary
+from core.async_views import AsyncAPIViewMixin
+from info.cache import get_cache_version, aget_cache_version, get_cache_timeout, get_response_cache_key, get_etag
+
+
+class CachedResponseMixin:
+    """
+    Mixin to cache GET responses per path, query string and active language.
+    The cache is invalidated by bumping the info cache version whenever an info model changes, responses carry
+    ETag & Last-Modified headers so clients can revalidate them and get 304 responses.
+    """
+
+    def get(self, request, *args, **kwargs):
+        version = get_cache_version()
+        key = get_response_cache_key(request, version)
+        cached = cache.get(key)
+        if cached is None:
+            # Read from the primary, a replica may still have the content of the previous version
+            with read_from_primary():
+                response = super().get(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            cached = {'data': response.data, 'etag': get_etag(response.data)}
+            cache.set(key, cached, get_cache_timeout())
+        return self.get_cached_response(request, cached, version)
+
+    @staticmethod
+    def get_cached_response(request, cached: dict, version: float):
+        etag, last_modified = cached['etag'], int(version)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = Response(cached['data'])
+        response.headers['ETag'] = etag
+        response.headers['Last-Modified'] = http_date(last_modified)
+        return response
+
+
+class AsyncCachedResponseMixin(AsyncAPIViewMixin, CachedResponseMixin):
+    """Same as `CachedResponseMixin` in an async view, only cache misses run the sync view in a thread"""
+
+    async def get(self, request, *args, **kwargs):
+        version = await aget_cache_version()
+        key = get_response_cache_key(request, version)
+        cached = await cache.aget(key)
+        if cached is None:
+            with read_from_primary():
+                response = await sync_to_async(super(CachedResponseMixin, self).get)(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            cached = {'data': response.data, 'etag': get_etag(response.data)}
+            await cache.aset(key, cached, get_cache_timeout())
+        return self.get_cached_response(request, cached, version)
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 
+from core.serializers import ImageSrcsetField
 from info.models import MainInfo, AboutUs, TermsOfService, CookiePolicy, PrivacyPolicy, FAQs, ContactUs, HeaderImage
 
 
@@ -53,6 +54,8 @@ class ContactUsSerializer(serializers.ModelSerializer):
 
 
 class HeaderImageSerializer(serializers.ModelSerializer):
+    image_srcset = ImageSrcsetField('image')
+
     class Meta:
         model = HeaderImage
-        exclude = ()
+        exclude = ('image_variants', )
@@ -0,0 +1,8 @@
+from rest_framework.throttling import UserRateThrottle
+
+from core.throttling import FixedWindowRateThrottle
+
+
+class ContactUsRateThrottle(FixedWindowRateThrottle, UserRateThrottle):
+    """Contact messages are limited per user, or per IP address for anonymous ones"""
+    scope = 'contact_us'
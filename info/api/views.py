@@ -1,63 +1,72 @@
+from django.conf import settings
+
 from rest_framework.permissions import AllowAny
 from rest_framework.generics import RetrieveAPIView, CreateAPIView, ListAPIView
 
-
+from core.metrics import SerializerMetricsMixin
+from info.utils import get_main_info
 from info.models import MainInfo, FAQs, AboutUs, TermsOfService, CookiePolicy, PrivacyPolicy, HeaderImage
+from .mixins import CachedResponseMixin, AsyncCachedResponseMixin
+from .throttling import ContactUsRateThrottle
 from .filters import FAQsFilter, AboutUsFilter, TermsOfServiceFilter, CookiePolicyFilter, PrivacyPolicyFilter
 from .serializers import (MainInfoSerializer, FAQsSerializer, AboutUsSerializer, TermsOfServiceSerializer,
                           CookiePolicySerializer, PrivacyPolicySerializer, ContactUsSerializer, HeaderImageSerializer)
 
 
-class MainInfoAPIView(RetrieveAPIView):
+CachedViewMixin = AsyncCachedResponseMixin if settings.ASYNC_VIEWS else CachedResponseMixin
+
+
+class MainInfoAPIView(SerializerMetricsMixin, CachedViewMixin, RetrieveAPIView):
     queryset = MainInfo.objects.all()
     serializer_class = MainInfoSerializer
     permission_classes = [AllowAny]
 
     def get_object(self):
-        return self.get_queryset().first()
+        return get_main_info()
 
 
-class FAQsAPIView(ListAPIView):
+class FAQsAPIView(SerializerMetricsMixin, CachedViewMixin, ListAPIView):
     queryset = FAQs.objects.all()
     serializer_class = FAQsSerializer
     filterset_class = FAQsFilter
     permission_classes = [AllowAny]
 
 
-class AboutUsAPIView(ListAPIView):
+class AboutUsAPIView(SerializerMetricsMixin, CachedViewMixin, ListAPIView):
     queryset = AboutUs.objects.all()
     serializer_class = AboutUsSerializer
     filterset_class = AboutUsFilter
     permission_classes = [AllowAny]
 
 
-class TermsOfServiceAPIView(ListAPIView):
+class TermsOfServiceAPIView(SerializerMetricsMixin, CachedViewMixin, ListAPIView):
     queryset = TermsOfService.objects.all()
     serializer_class = TermsOfServiceSerializer
     filterset_class = TermsOfServiceFilter
     permission_classes = [AllowAny]
 
 
-class CookiePolicyAPIView(ListAPIView):
+class CookiePolicyAPIView(SerializerMetricsMixin, CachedViewMixin, ListAPIView):
     queryset = CookiePolicy.objects.all()
     serializer_class = CookiePolicySerializer
     filterset_class = CookiePolicyFilter
     permission_classes = [AllowAny]
 
 
-class PrivacyPolicyAPIView(ListAPIView):
+class PrivacyPolicyAPIView(SerializerMetricsMixin, CachedViewMixin, ListAPIView):
     queryset = PrivacyPolicy.objects.all()
     serializer_class = PrivacyPolicySerializer
     filterset_class = PrivacyPolicyFilter
     permission_classes = [AllowAny]
 
 
-class ContactUsAPIView(CreateAPIView):
+class ContactUsAPIView(SerializerMetricsMixin, CreateAPIView):
     serializer_class = ContactUsSerializer
     permission_classes = [AllowAny]
+    throttle_classes = [ContactUsRateThrottle]
 
 
-class HeaderImageAPIView(ListAPIView):
+class HeaderImageAPIView(SerializerMetricsMixin, CachedViewMixin, ListAPIView):
     queryset = HeaderImage.objects.active()
     serializer_class = HeaderImageSerializer
     permission_classes = [AllowAny]
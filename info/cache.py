@@ -0,0 +1,42 @@
+import json
+import time
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import quote_etag
+from django.utils.translation import get_language
+
+from rest_framework.utils.encoders import JSONEncoder
+
+
+CACHE_VERSION_KEY = 'info:version'
+DEFAULT_INFO_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def get_cache_version() -> float:
+    """Time of the last change of the info content, it is part of every cached response key"""
+    return cache.get_or_set(CACHE_VERSION_KEY, time.time, timeout=None)
+
+
+async def aget_cache_version() -> float:
+    return await cache.aget_or_set(CACHE_VERSION_KEY, time.time, timeout=None)
+
+
+def bump_cache_version():
+    """Invalidate all cached info responses at once, by moving them to a new version"""
+    cache.set(CACHE_VERSION_KEY, time.time(), timeout=None)
+
+
+def get_cache_timeout() -> int:
+    return getattr(settings, 'INFO_CACHE_TIMEOUT', DEFAULT_INFO_CACHE_TIMEOUT)
+
+
+def get_response_cache_key(request, version: float) -> str:
+    url = hashlib.md5(f'{request.get_host()}{request.get_full_path()}'.encode()).hexdigest()
+    return f'info:response:{version}:{get_language()}:{url}'
+
+
+def get_etag(data) -> str:
+    content = json.dumps(data, cls=JSONEncoder, sort_keys=True)
+    return quote_etag(hashlib.md5(content.encode()).hexdigest())
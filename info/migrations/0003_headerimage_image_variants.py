@@ -0,0 +1,18 @@
+# Generated by Django 4.2.2 on 2026-10-18 20:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('info', '0002_headerimage_url'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='headerimage',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Image Variants'),
+        ),
+    ]
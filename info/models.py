@@ -1,8 +1,13 @@
 from django.db import models
+from django.db.models.signals import post_save, post_delete
 from django.utils.translation import gettext_lazy as _
 
 from phonenumber_field.modelfields import PhoneNumberField
 
+from core.images import register_image_variants, image_variants_updated
+
+from .cache import bump_cache_version
+
 
 class MainInfo(models.Model):
     facebook = models.URLField(verbose_name=_('Facebook Link'))
@@ -111,6 +116,7 @@ class HeaderImage(models.Model):
                            help_text=_("Text is meant to convey the “why” of the image as it relates to the content of "
                                        "a document or webpage"))
     image = models.ImageField(upload_to='home/header', verbose_name=_("Image"))
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, verbose_name=_("Image Variants"))
     active = models.BooleanField(default=True, help_text=_("Setting it to false, makes the image disappear from homepage"),
                                  verbose_name=_("Active"))
     url = models.URLField(null=True, blank=True, verbose_name=_('Link'))
@@ -123,3 +129,16 @@ class HeaderImage(models.Model):
     class Meta:
         verbose_name = _('Home Page Image')
         verbose_name_plural = _('Home Page Images')
+
+
+register_image_variants(HeaderImage, 'image', 'header')
+
+
+def invalidate_info_cache(sender, instance, *args, **kwargs):
+    bump_cache_version()
+
+
+for model in (MainInfo, FAQs, AboutUs, TermsOfService, CookiePolicy, PrivacyPolicy, HeaderImage):
+    post_save.connect(invalidate_info_cache, sender=model)
+    post_delete.connect(invalidate_info_cache, sender=model)
+image_variants_updated.connect(invalidate_info_cache, sender=HeaderImage)
@@ -1,3 +1,26 @@
+from django.db import DEFAULT_DB_ALIAS
+
+from .cache import get_cache_version
+from .models import MainInfo
+
+
+# Last loaded main info with the info cache version it was loaded at
+main_info_snapshot = (None, None)
+
+
+def get_main_info():
+    """
+    Get the website main info, it is loaded once per process and reused until the info cache version changes,
+    which happens whenever an info model is saved or deleted.
+    """
+    global main_info_snapshot
+    version = get_cache_version()
+    snapshot_version, main_info = main_info_snapshot
+    if snapshot_version != version:
+        # Read from the primary, a replica may still have the main info of the previous version
+        main_info = MainInfo.objects.using(DEFAULT_DB_ALIAS).first()
+        main_info_snapshot = (version, main_info)
+    return main_info
 
 
 def get_model_fields_names(instance, exclude=None):